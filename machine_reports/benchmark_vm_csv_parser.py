@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import vm_csv_parser
+
+
+# Times the vm_csv_parser pipeline against synthetic RVTools shaped inventories so that regressions in the parser
+# show up before it is run against customer data. The numbers are only comparable between runs on the same machine
+
+# Share of the inventory running each 'VM OS' string. Override with --os-distribution
+DEFAULT_OS_DISTRIBUTION = {
+    'Red Hat Enterprise Linux 8 (64-bit)': 0.22,
+    'Red Hat Enterprise Linux 7 (64-bit)': 0.14,
+    'Red Hat Enterprise Linux 9 (64-bit)': 0.06,
+    'Microsoft Windows Server 2019 (64-bit)': 0.14,
+    'Microsoft Windows Server 2016 or later (64-bit)': 0.08,
+    'Microsoft Windows 10 (64-bit)': 0.07,
+    'SUSE Linux Enterprise 12 (64-bit)': 0.06,
+    'SUSE Linux Enterprise 15 (64-bit)': 0.04,
+    'Ubuntu Linux (64-bit)': 0.07,
+    'CentOS 7 (64-bit)': 0.05,
+    'CentOS 4/5 (32-bit)': 0.02,
+    'Other Linux (64-bit)': 0.05,
+}
+DEFAULT_ENVIRONMENTS = ['prod', 'atlas-prod', 'dr', 'dev', 'dev1', 'test', 'qa', 'uat', 'atlas-dev', 'sandbox']
+DEFAULT_PROD_ENV_LABELS = ['prod', 'dr']
+DEFAULT_ROW_COUNTS = [10000, 100000, 1000000]
+
+# Each entry is (name, function) where function takes the benchmark context built by build_context and runs one step
+BENCHMARKS = [
+    ('read_inventory_file', lambda context: vm_csv_parser.read_inventory_file(context['csv_path'])),
+    ('add_extra_columns', lambda context: run_add_extra_columns(context['raw'])),
+    ('prepare_report_frame', lambda context: vm_csv_parser.prepare_report_frame(context['enriched'], *context['prod_env_labels'])),
+    ('summarize_inventory', lambda context: vm_csv_parser.summarize_inventory(context['report_df'])),
+    ('generate_all_OS_counts', lambda context: vm_csv_parser.generate_all_OS_counts(context['summary'])),
+    ('os_by_version', lambda context: [vm_csv_parser.os_by_version(context['summary'], os_name) for os_name in context['os_names']]),
+    ('sort_attribute_by_environment (OS)', lambda context: vm_csv_parser.sort_attribute_by_environment(context['summary'], *context['prod_env_labels'], environment_filter='both')),
+    ('sort_attribute_by_environment (disk)', lambda context: [vm_csv_parser.sort_attribute_by_environment(context['summary'], *context['prod_env_labels'], attribute="diskSpace", os_filter=os_name, environment_filter='both')
+                                                              for os_name in context['os_names']]),
+    ('calculate_average_ram', lambda context: vm_csv_parser.calculate_average_ram(context['summary'], '')),
+    ('calculate_resource_profiles', lambda context: vm_csv_parser.calculate_resource_profiles(context['enriched'], *context['prod_env_labels'])),
+]
+
+
+def generate_synthetic_inventory(rows, os_distribution=None, environments=None, seed=0):
+    """
+    Builds an inventory with the columns vm_csv_parser expects. CPU, RAM and disk follow skewed distributions so
+    that every disk space range and a long tail of large VMs are represented.
+
+    Args:
+        rows (int): The number of VMs to generate.
+        os_distribution (dict): 'VM OS' string to relative weight (default: DEFAULT_OS_DISTRIBUTION).
+        environments (list): The 'Environment' values to pick from uniformly (default: DEFAULT_ENVIRONMENTS).
+        seed (int): Seed for the random generator so that runs are repeatable (default: 0).
+
+    Returns:
+        pandas.DataFrame of synthetic VMs.
+    """
+    os_distribution = os_distribution or DEFAULT_OS_DISTRIBUTION
+    environments = environments or DEFAULT_ENVIRONMENTS
+    rng = np.random.default_rng(seed)
+
+    os_names = list(os_distribution)
+    weights = np.array([os_distribution[os_name] for os_name in os_names], dtype=float)
+    cpu_choices = np.array([1, 2, 4, 8, 16, 32])
+    provisioned = np.round(rng.lognormal(mean=5.5, sigma=1.1, size=rows), 3)
+
+    return pd.DataFrame({
+        'VM': [f'vm-{index:07d}' for index in range(rows)],
+        'VM Power': rng.choice(['PoweredOn', 'PoweredOff'], size=rows, p=[0.85, 0.15]),
+        'VM OS': rng.choice(os_names, size=rows, p=weights / weights.sum()),
+        'VM CPU': rng.choice(cpu_choices, size=rows, p=[0.05, 0.3, 0.35, 0.2, 0.08, 0.02]),
+        'VM MEM (GB)': rng.choice(np.array([1, 2, 4, 8, 16, 32, 64, 128]), size=rows, p=[0.02, 0.1, 0.2, 0.3, 0.2, 0.1, 0.06, 0.02]),
+        'VM Provisioned (GB)': provisioned,
+        'VM Used (GB)': np.round(provisioned * rng.uniform(0.05, 0.95, size=rows), 3),
+        'Environment': rng.choice(environments, size=rows),
+    })
+
+
+def run_add_extra_columns(dataFrame):
+    """
+    Runs add_extra_columns from a cold OS parse cache so every size pays for parsing its distinct 'VM OS' strings.
+
+    Args:
+        dataFrame: The raw inventory.
+
+    Returns:
+        The enriched inventory.
+    """
+    vm_csv_parser.parse_os_string.cache_clear()
+    dataFrame = dataFrame.copy()
+    vm_csv_parser.add_extra_columns(dataFrame, output_path=None)
+    return dataFrame
+
+
+def build_context(raw, csv_path, prod_env_labels):
+    """
+    Runs the pipeline once to get the input every benchmark step needs.
+
+    Args:
+        raw: The synthetic inventory.
+        csv_path (str): Where the synthetic inventory was written as CSV.
+        prod_env_labels (list): Keywords denoting prod environments.
+
+    Returns:
+        dict of the intermediate frames.
+    """
+    enriched = run_add_extra_columns(raw)
+    report_df = vm_csv_parser.prepare_report_frame(enriched, *prod_env_labels)
+    summary = vm_csv_parser.summarize_inventory(report_df)
+    return {'raw': raw, 'csv_path': csv_path, 'prod_env_labels': prod_env_labels, 'enriched': enriched,
+            'report_df': report_df, 'summary': summary, 'os_names': summary['OS Name'].dropna().unique()}
+
+
+def time_benchmark(function, context, repeat=3):
+    """
+    Times a benchmark step and records its peak memory. The timing runs are kept separate from the tracemalloc run
+    because tracing allocations slows pandas down considerably.
+
+    Args:
+        function: The benchmark step.
+        context: dict returned by build_context.
+        repeat (int): How many times to run the step, the fastest run is reported (default: 3).
+
+    Returns:
+        tuple of (fastest run in seconds, peak memory allocated in MB).
+    """
+    # The reports print their tables, which would drown out the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function(context)
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            function(context)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return min(timings), peak / 1024 ** 2
+
+
+def run_benchmarks(row_counts, os_distribution=None, environments=None, prod_env_labels=None, repeat=3, seed=0, work_dir='/tmp'):
+    """
+    Times every entry in BENCHMARKS against a synthetic inventory of each size.
+
+    Args:
+        row_counts (list): The inventory sizes to benchmark.
+        os_distribution (dict): Passed to generate_synthetic_inventory.
+        environments (list): Passed to generate_synthetic_inventory.
+        prod_env_labels (list): Keywords denoting prod environments (default: DEFAULT_PROD_ENV_LABELS).
+        repeat (int): How many times to run each step.
+        seed (int): Seed for the synthetic inventory.
+        work_dir (str): Where to write the synthetic CSV read by read_inventory_file.
+
+    Returns:
+        pandas.DataFrame with a row per benchmark and inventory size.
+    """
+    prod_env_labels = prod_env_labels or DEFAULT_PROD_ENV_LABELS
+    results = []
+    for rows in row_counts:
+        raw = generate_synthetic_inventory(rows, os_distribution=os_distribution, environments=environments, seed=seed)
+        csv_path = os.path.join(work_dir, f'vm_csv_parser_benchmark_{rows}.csv')
+        raw.to_csv(csv_path, index=False)
+        try:
+            context = build_context(raw, csv_path, prod_env_labels)
+            for name, function in BENCHMARKS:
+                seconds, peak_mb = time_benchmark(function, context, repeat=repeat)
+                results.append({'Benchmark': name, 'Rows': rows, 'Seconds': round(seconds, 4), 'Peak Memory (MB)': round(peak_mb, 1)})
+                print(f"{name:<40} {rows:>9} rows {seconds:>9.4f}s {peak_mb:>9.1f} MB", file=sys.stderr)
+        finally:
+            os.remove(csv_path)
+    return pd.DataFrame(results)
+
+
+def find_regressions(results, baseline, tolerance=0.25):
+    """
+    Compares benchmark results against a previous run.
+
+    Args:
+        results: DataFrame returned by run_benchmarks.
+        baseline: DataFrame returned by run_benchmarks for an earlier version of the parser.
+        tolerance (float): How much slower (as a fraction) a step may get before it counts as a regression (default: 0.25).
+
+    Returns:
+        pandas.DataFrame of the steps which got slower than the tolerance.
+    """
+    merged = results.merge(baseline, on=['Benchmark', 'Rows'], suffixes=('', ' (baseline)'))
+    merged['Change'] = merged['Seconds'] / merged['Seconds (baseline)'] - 1
+    return merged[merged['Change'] > tolerance]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark vm_csv_parser against synthetic inventories')
+    parser.add_argument('--rows', type=str, default=','.join(str(rows) for rows in DEFAULT_ROW_COUNTS), help="Comma separated inventory sizes to benchmark. Default: '10000,100000,1000000'")
+    parser.add_argument('--repeat', type=int, default=3, help='How many times to run each step, the fastest run is reported. Default: 3')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic inventory. Default: 0')
+    parser.add_argument('--os-distribution', type=str, help='A JSON file mapping "VM OS" strings to their relative weight in the synthetic inventory')
+    parser.add_argument('--environments', type=str, help="Comma separated 'Environment' values for the synthetic inventory")
+    parser.add_argument('--prod-env-labels', type=str, help="The environments that represent prod. Passed as CSV i.e. --prod-env-labels 'prod,dr'. Default: 'prod,dr'")
+    parser.add_argument('--write-inventory', type=str, help='Write a synthetic inventory of the first --rows size to this CSV and exit')
+    parser.add_argument('--output', type=str, help='Save the results to this .csv or .json file')
+    parser.add_argument('--baseline', type=str, help='A .csv or .json file saved with --output by an earlier run. Exits with 1 if any step got slower than --tolerance')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='How much slower (as a fraction) a step may get compared to --baseline. Default: 0.25')
+    args = parser.parse_args()
+
+    try:
+        row_counts = [int(rows) for rows in args.rows.split(',')]
+    except ValueError:
+        print("--rows must be a comma separated list of whole numbers... exiting\n")
+        exit()
+
+    os_distribution = None
+    if args.os_distribution:
+        with open(args.os_distribution) as distribution_file:
+            os_distribution = json.load(distribution_file)
+    environments = args.environments.split(',') if args.environments else None
+    prod_env_labels = args.prod_env_labels.split(',') if args.prod_env_labels else None
+
+    if args.write_inventory:
+        generate_synthetic_inventory(row_counts[0], os_distribution=os_distribution, environments=environments, seed=args.seed).to_csv(args.write_inventory, index=False)
+        print(f"Wrote {row_counts[0]} VMs to {args.write_inventory}")
+        exit()
+
+    # The report functions read their settings from the parser's command line arguments
+    vm_csv_parser.args = argparse.Namespace(generate_graphs=False, output_dir=None, minimum_count=None)
+
+    results = run_benchmarks(row_counts, os_distribution=os_distribution, environments=environments, prod_env_labels=prod_env_labels,
+                             repeat=args.repeat, seed=args.seed)
+    print(results.pivot(index='Benchmark', columns='Rows', values=['Seconds', 'Peak Memory (MB)']).reindex([name for name, _ in BENCHMARKS]).to_string())
+
+    if args.output:
+        if args.output.endswith('.json'):
+            results.to_json(args.output, orient='records', indent=2)
+        else:
+            results.to_csv(args.output, index=False)
+
+    if args.baseline:
+        baseline = pd.read_json(args.baseline, orient='records') if args.baseline.endswith('.json') else pd.read_csv(args.baseline)
+        regressions = find_regressions(results, baseline, tolerance=args.tolerance)
+        if not regressions.empty:
+            print(f"\nSteps more than {args.tolerance:.0%} slower than {args.baseline}")
+            print(regressions[['Benchmark', 'Rows', 'Seconds (baseline)', 'Seconds', 'Change']].to_string(index=False))
+            exit(1)
+        print(f"\nNo step is more than {args.tolerance:.0%} slower than {args.baseline}")
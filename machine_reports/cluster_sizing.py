@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+
+import argparse
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+import vm_csv_parser
+
+
+# Estimates how many OpenShift Virtualization worker nodes are needed to run an inventory, for every combination of
+# node shape and CPU/memory overcommit. VMs with the same CPU, memory (and disk) requirements are packed together
+# as a group, which is what keeps a sweep of hundreds of scenarios over 100k+ VMs down to seconds
+
+# name=cpu:memory_gb[:disk_gb]. Without a disk size the provisioned disk is assumed to live on shared storage
+DEFAULT_NODE_SHAPES = 'small=32:128,medium=64:256,large=96:384,xlarge=128:512'
+DEFAULT_CPU_OVERCOMMITS = '1,2,4,8'
+DEFAULT_MEMORY_OVERCOMMITS = '1'
+# The inventory columns holding each resource a node has to provide
+DEMAND_COLUMNS = {'cpu': 'VM CPU', 'memory': 'VM MEM (GB)', 'disk': 'VM Provisioned (GB)'}
+# Small tolerance so that a VM which exactly fills the remaining capacity is not rejected due to float rounding
+FIT_TOLERANCE = 1e-9
+
+
+def parse_node_shapes(node_shapes):
+    """
+    Parses node shapes in the form name=cpu:memory_gb[:disk_gb] separated by commas.
+
+    Args:
+        node_shapes (str): i.e. 'small=32:128,large=96:384:2000'.
+
+    Returns:
+        List of dicts with 'name', 'cpu', 'memory' and 'disk' (None when the node has no local disk for VMs).
+    """
+    shapes = []
+    for node_shape in node_shapes.split(','):
+        name, _, resources = node_shape.partition('=')
+        values = [float(value) for value in resources.split(':')]
+        if len(values) not in (2, 3):
+            raise ValueError(f"Node shape '{node_shape}' should be name=cpu:memory_gb[:disk_gb]")
+        shapes.append({'name': name, 'cpu': values[0], 'memory': values[1], 'disk': values[2] if len(values) == 3 else None})
+    return shapes
+
+
+def build_scenarios(node_shapes, cpu_overcommits, memory_overcommits):
+    """
+    Returns every combination of node shape and overcommit, along with the capacity a node offers in each one.
+
+    Args:
+        node_shapes: List of dicts returned by parse_node_shapes.
+        cpu_overcommits: List of vCPU to physical core ratios.
+        memory_overcommits: List of memory overcommit ratios.
+
+    Returns:
+        pandas.DataFrame with a row per scenario.
+    """
+    scenarios = [{'Node Shape': shape['name'], 'Node CPU': shape['cpu'], 'Node Memory (GB)': shape['memory'], 'Node Disk (GB)': shape['disk'],
+                  'CPU Overcommit': cpu_overcommit, 'Memory Overcommit': memory_overcommit}
+                 for shape, cpu_overcommit, memory_overcommit in itertools.product(node_shapes, cpu_overcommits, memory_overcommits)]
+    return pd.DataFrame(scenarios)
+
+
+def get_demand_groups(dataFrame, resources, disk_granularity=10):
+    """
+    Collapses the VMs into groups with the same requirements. Disk is rounded up to disk_granularity GB so that
+    near identical VMs end up in the same group; rounding up keeps the sizing conservative.
+
+    Args:
+        dataFrame: The enriched inventory.
+        resources: The keys of DEMAND_COLUMNS to pack on i.e. ['cpu', 'memory'].
+        disk_granularity (float): Round disk requirements up to a multiple of this many GB (default: 10).
+
+    Returns:
+        tuple of (numpy array of distinct requirements with a column per resource, numpy array of how many VMs have them).
+    """
+    demands = np.column_stack([dataFrame[DEMAND_COLUMNS[resource]].to_numpy(dtype=float) for resource in resources])
+    if 'disk' in resources and disk_granularity:
+        disk_position = resources.index('disk')
+        demands[:, disk_position] = np.ceil(demands[:, disk_position] / disk_granularity) * disk_granularity
+    return np.unique(demands, axis=0, return_counts=True)
+
+
+def copies_per_node(free, demand, limit):
+    """
+    Returns how many VMs with the given requirements fit in each amount of free capacity.
+
+    Args:
+        free: numpy array of free capacity with a row per node.
+        demand: numpy array of one VM's requirements.
+        limit (int): The most copies wanted, which is also used for VMs that require nothing.
+
+    Returns:
+        numpy array of integers, one per node.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = np.where(demand > 0, np.floor(free / np.where(demand > 0, demand, 1) + FIT_TOLERANCE), np.inf)
+    return np.clip(ratios.min(axis=-1), 0, limit).astype(np.int64)
+
+
+def first_fit_decreasing(demands, counts, capacity):
+    """
+    Packs the VM groups onto nodes with first-fit-decreasing, largest VMs (by their biggest share of a node) first.
+    Because every VM in a group is identical, first-fit places a whole group by filling each node that still has room
+    in order, so each group is placed with a handful of vectorized operations instead of one VM at a time.
+
+    Args:
+        demands: numpy array returned by get_demand_groups.
+        counts: numpy array of the number of VMs in each group.
+        capacity: numpy array of what a node provides for each resource.
+
+    Returns:
+        tuple of (numpy array of the resources used on each node, number of VMs which are too big for a node).
+    """
+    if not len(demands):
+        # Nothing to place, e.g. --powered-on-only with no powered on VMs
+        return np.zeros((0, len(capacity))), 0
+    share = (demands / capacity).max(axis=1)
+    order = np.argsort(-share, kind='stable')
+    # A node without room for the smallest requirement in some resource can not take any more VMs and is set aside
+    smallest_demand = demands.min(axis=0)
+    open_nodes = np.zeros((0, len(capacity)))
+    full_nodes = []
+    unplaceable = 0
+    for demand, count in zip(demands[order], counts[order]):
+        if (demand > capacity * (1 + FIT_TOLERANCE)).any():
+            unplaceable += count
+            continue
+        if len(open_nodes):
+            # Fill the existing nodes in order, each taking as many copies as fit
+            fits = copies_per_node(capacity - open_nodes, demand, count)
+            already_placed = np.cumsum(fits) - fits
+            taken = np.clip(count - already_placed, 0, fits)
+            open_nodes += taken[:, None] * demand
+            count -= taken.sum()
+        if count:
+            # Open as many new nodes as the rest of the group needs, all full except possibly the last one
+            per_node = copies_per_node(capacity, demand, count)
+            new_node_count, remainder = divmod(count, per_node)
+            new_nodes = [np.tile(demand * per_node, (new_node_count, 1))]
+            if remainder:
+                new_nodes.append((demand * remainder)[None, :])
+            open_nodes = np.vstack([open_nodes] + new_nodes)
+        # Closed nodes keep their position relative to each other, and come before every open node when they are
+        # combined at the end, which does not matter since first-fit never revisits them
+        closed = (capacity - open_nodes < smallest_demand - FIT_TOLERANCE).any(axis=1)
+        if closed.any():
+            full_nodes.append(open_nodes[closed])
+            open_nodes = open_nodes[~closed]
+    return np.vstack(full_nodes + [open_nodes]), unplaceable
+
+
+def estimate_nodes(demands, counts, capacities):
+    """
+    Estimates the number of nodes for many scenarios at once without placing any VMs. For each resource, the nodes
+    must hold the total of what the VMs require, and VMs needing more than half a node of it can not share a node
+    with each other. The largest of these is a lower bound, so no packing can use fewer nodes. First-fit-decreasing
+    gives a placement that is known to work, so the real number of nodes needed lies between the two.
+
+    Args:
+        demands: numpy array returned by get_demand_groups.
+        counts: numpy array of the number of VMs in each group.
+        capacities: numpy array with a row per scenario of what a node provides for each resource.
+
+    Returns:
+        tuple of (numpy array of nodes per scenario, numpy array of VMs too big for a node per scenario).
+    """
+    # scenarios x groups x resources
+    ratios = demands[None, :, :] / capacities[:, None, :]
+    fits = (ratios <= 1 + FIT_TOLERANCE).all(axis=2)
+    placeable_counts = fits * counts
+
+    totals = placeable_counts @ demands
+    volume_nodes = np.ceil(totals / capacities - FIT_TOLERANCE)
+    large_vms = np.einsum('sg,sgr->sr', placeable_counts, ratios > 0.5)
+    nodes = np.maximum(volume_nodes, large_vms).max(axis=1)
+    unplaceable = (~fits) @ counts
+    return nodes.astype(np.int64), unplaceable
+
+
+def size_cluster(dataFrame, scenarios, algorithm='both', disk_granularity=10):
+    """
+    Works out how many nodes every scenario needs to run the VMs in dataFrame.
+
+    Args:
+        dataFrame: The enriched inventory.
+        scenarios: DataFrame returned by build_scenarios.
+        algorithm (str): 'estimate', 'ffd' (first-fit-decreasing) or 'both' (default: 'both').
+        disk_granularity (float): Passed to get_demand_groups.
+
+    Returns:
+        A copy of scenarios with the VM count, the nodes needed and the resulting utilization.
+    """
+    results = scenarios.copy()
+    results['VMs'] = len(dataFrame)
+    # Shapes with and without local disk pack on different resources, so they are handled separately
+    for has_disk, shape_scenarios in results.groupby(results['Node Disk (GB)'].notna()):
+        resources = ['cpu', 'memory', 'disk'] if has_disk else ['cpu', 'memory']
+        demands, counts = get_demand_groups(dataFrame, resources, disk_granularity=disk_granularity)
+        capacity_columns = [shape_scenarios['Node CPU'] * shape_scenarios['CPU Overcommit'],
+                            shape_scenarios['Node Memory (GB)'] * shape_scenarios['Memory Overcommit']]
+        if has_disk:
+            capacity_columns.append(shape_scenarios['Node Disk (GB)'])
+        capacities = np.column_stack([column.to_numpy(dtype=float) for column in capacity_columns])
+
+        if algorithm in ('estimate', 'both'):
+            nodes, unplaceable = estimate_nodes(demands, counts, capacities)
+            results.loc[shape_scenarios.index, 'Nodes (estimate)'] = nodes
+            results.loc[shape_scenarios.index, 'Unplaceable VMs'] = unplaceable
+        if algorithm in ('ffd', 'both'):
+            for index, capacity in zip(shape_scenarios.index, capacities):
+                used, unplaceable = first_fit_decreasing(demands, counts, capacity)
+                results.loc[index, 'Nodes (first fit decreasing)'] = len(used)
+                results.loc[index, 'Unplaceable VMs'] = unplaceable
+                if len(used):
+                    utilization = used.sum(axis=0) / (len(used) * capacity)
+                    results.loc[index, 'CPU Utilization'] = round(utilization[0], 3)
+                    results.loc[index, 'Memory Utilization'] = round(utilization[1], 3)
+
+    count_columns = [column for column in ['Unplaceable VMs', 'Nodes (estimate)', 'Nodes (first fit decreasing)'] if column in results.columns]
+    results[count_columns] = results[count_columns].astype(np.int64)
+    return results
+
+
+def size_clusters(dataFrame, scenarios, *env_keywords, per_environment=False, algorithm='both', disk_granularity=10):
+    """
+    Sizes a single cluster for the whole inventory, or one cluster per environment type when per_environment is set.
+
+    Args:
+        dataFrame: The enriched inventory.
+        scenarios: DataFrame returned by build_scenarios.
+        *env_keywords: Keywords denoting prod environments.
+        per_environment (bool): Size prod and non-prod (or every environment if no keywords are given) separately (default: False).
+        algorithm (str): Passed to size_cluster.
+        disk_granularity (float): Passed to get_demand_groups.
+
+    Returns:
+        pandas.DataFrame with a row per scenario (and environment).
+    """
+    if not per_environment:
+        return size_cluster(dataFrame, scenarios, algorithm=algorithm, disk_granularity=disk_granularity)
+
+    if env_keywords:
+        environments = vm_csv_parser.classify_environments(dataFrame['Environment'], *env_keywords)
+    else:
+        environments = dataFrame['Environment']
+    results = []
+    for environment, environment_df in dataFrame.groupby(environments, observed=True):
+        environment_results = size_cluster(environment_df, scenarios, algorithm=algorithm, disk_granularity=disk_granularity)
+        environment_results.insert(0, 'Environment', environment)
+        results.append(environment_results)
+    return pd.concat(results, ignore_index=True)
+
+
+def parse_ratios(ratios, flag):
+    """
+    Parses a comma separated list of overcommit ratios.
+
+    Args:
+        ratios (str): i.e. '1,2,4'.
+        flag (str): The command line flag the ratios came from, used in the error message.
+
+    Returns:
+        List of floats.
+    """
+    try:
+        return [float(ratio) for ratio in ratios.split(',')]
+    except ValueError:
+        print(f"{flag} must be a comma separated list of numbers... exiting\n")
+        exit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Estimate the OpenShift Virtualization worker nodes needed for an inventory')
+    parser.add_argument('--file', type=str, nargs='+', required=True, help="One or more CSV or Excel inventories to size together. Glob patterns are expanded i.e. --file '/data/rvtools/*.xlsx'")
+    parser.add_argument('--node-shapes', type=str, default=DEFAULT_NODE_SHAPES, help=f"Comma separated node shapes as name=cpu:memory_gb[:disk_gb]. Only shapes with a disk size pack the provisioned disk onto the node. Default: '{DEFAULT_NODE_SHAPES}'")
+    parser.add_argument('--cpu-overcommit', type=str, default=DEFAULT_CPU_OVERCOMMITS, help=f"Comma separated vCPU to core ratios to try. Default: '{DEFAULT_CPU_OVERCOMMITS}'")
+    parser.add_argument('--memory-overcommit', type=str, default=DEFAULT_MEMORY_OVERCOMMITS, help=f"Comma separated memory overcommit ratios to try. Default: '{DEFAULT_MEMORY_OVERCOMMITS}'")
+    parser.add_argument('--algorithm', type=str, choices=['both', 'ffd', 'estimate'], default='both', help='Pack the VMs with first-fit-decreasing (ffd), use the vectorized estimate, or both. Default: both')
+    parser.add_argument('--disk-granularity', type=float, default=10, help='Round the disk of each VM up to a multiple of this many GB when packing disk. Default: 10')
+    parser.add_argument('--powered-on-only', action='store_true', help='Only size for the VMs which are powered on')
+    parser.add_argument('--per-environment', action='store_true', help='Size a separate cluster for prod and non-prod (see --prod-env-labels), or for every environment if no labels are given')
+    parser.add_argument('--prod-env-labels', type=str, help="The values in your data that represent prod environments. Passed as CSV i.e. --prod-env-labels 'baker,dte'")
+    parser.add_argument('--output', type=str, help='Also save the results to this .csv or .json file')
+    parser.add_argument('--workers', type=int, help='The number of processes used to parse multiple inventory files. Defaults to the number of CPUs')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the on-disk cache of the parsed inventory')
+    parser.add_argument('--cache-dir', type=str, default=vm_csv_parser.DEFAULT_CACHE_DIR, help=f'Where to store the parsed inventory cache. Default: {vm_csv_parser.DEFAULT_CACHE_DIR}')
+    args = parser.parse_args()
+
+    try:
+        node_shapes = parse_node_shapes(args.node_shapes)
+    except ValueError as error:
+        print(f"{error}... exiting\n")
+        exit()
+    scenarios = build_scenarios(node_shapes, parse_ratios(args.cpu_overcommit, '--cpu-overcommit'), parse_ratios(args.memory_overcommit, '--memory-overcommit'))
+    environments = args.prod_env_labels.split(',') if args.prod_env_labels else []
+
+    df = vm_csv_parser.load_inventories(vm_csv_parser.expand_inventory_paths(args.file), use_cache=not args.no_cache, cache_dir=args.cache_dir,
+                                        workers=args.workers, compact=True, columns=vm_csv_parser.INVENTORY_COLUMNS)
+    if args.powered_on_only:
+        df = df[df['VM Power'] == 'PoweredOn']
+    missing = df[list(DEMAND_COLUMNS.values())].isna().any(axis=1)
+    if missing.any():
+        print(f"Skipping {missing.sum()} VMs without a CPU, memory or disk size")
+        df = df[~missing]
+
+    start = time.perf_counter()
+    results = size_clusters(df, scenarios, *environments, per_environment=args.per_environment, algorithm=args.algorithm,
+                            disk_granularity=args.disk_granularity)
+    elapsed = time.perf_counter() - start
+
+    print(results.to_string(index=False))
+    print(f"\nSized {len(scenarios)} scenarios for {len(df)} VMs in {elapsed:.2f}s")
+    if args.output:
+        if args.output.endswith('.json'):
+            results.to_json(args.output, orient='records', indent=2)
+        else:
+            results.to_csv(args.output, index=False)
@@ -11,6 +11,21 @@ import numpy as np
 #from fuzzywuzzy import process
 import magic
 import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import functools
+import glob
+import hashlib
+import http.server
+import io
+import itertools
+import json
+import math
+import os
+import re
+import time
+import urllib.parse
 
 
 # This program expects a CSV with the following headings
@@ -24,19 +39,74 @@ import argparse
 
 # The primary purpose of this script is to aide in the assessment of migration to OpenShift Virtualization
 
-
-def format_dataframe_output(dataFrame):
+# Enriched inventories are cached on disk so that repeat runs with different report flags skip the CSV/Excel
+# parse and the regex in add_extra_columns. Bump CACHE_VERSION whenever the enrichment logic changes so that
+# stale caches are not picked up.
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "vm_csv_parser")
+CACHE_INDEX_FILE = "index.json"
+CATEGORICAL_COLUMNS = ['VM Power', 'VM OS', 'Environment', 'OS Name', 'OS Version', 'Architecture']
+# The columns the reports read. With --compact only these (plus the disk space and VM id columns) are loaded
+INVENTORY_COLUMNS = ['VM Power', 'VM OS', 'VM CPU', 'VM MEM (GB)', 'VM Provisioned (GB)', 'VM Used (GB)', 'Environment']
+
+# Upper bound (in GB) of each disk space range. Anything above the last edge goes into a final open ended range
+DEFAULT_DISK_SPACE_EDGES = [200, 400, 600, 900, 1500, 2000, 3000, 5000, 9000]
+TERABYTE_DISK_SPACE_EDGES = [2000, 9000]
+
+# Pulls the OS name, version and architecture out of strings such as "Red Hat Enterprise Linux 8 (64-bit)"
+DEFAULT_OS_PATTERN = r"^(?P<OS_Name>.*?)\s*(?P<OS_Version>(?:\d+\s+\w+|\w+)\s*(?:or later)?\s*)?\s*\((?P<Architecture>.*?64-bit|.*?32-bit)\)"
+# Vendor specific rules which are tried in order before DEFAULT_OS_PATTERN. Each rule is a dict with a 'pattern' using
+# the OS_Name, OS_Version and Architecture named groups, and optionally fixed 'OS Name', 'OS Version' or 'Architecture'
+# values which take precedence over the groups. Extra rules can be loaded from a JSON file with --os-parsing-rules
+OS_PARSING_RULES = []
+# Number of distinct 'VM OS' strings to remember the parsed result for
+OS_PARSE_CACHE_SIZE = 4096
+
+# The values classify_environments can assign to 'Environment Type'
+ENVIRONMENT_TYPES = ['prod', 'non-prod', 'all envs']
+
+# The columns every report is grouped by, see summarize_inventory
+SUMMARY_COLUMNS = ['OS Name', 'OS Version', 'Environment', 'Environment Type', 'Disk Space Range']
+# Chunks, snapshots and diffs are bucketed against these limits so their disk space range labels line up, see relabel_disk_space_ranges
+DISK_SPACE_PLACEHOLDER_LIMITS = (0, 0)
+# Snapshots of previous runs are kept in this directory under the cache directory, see save_snapshot
+SNAPSHOT_DIR_NAME = "snapshots"
+# The columns compared between snapshots, a change in any of them means the VM is re-summarized
+DIFF_COLUMNS = ['VM Power', 'VM OS', 'VM CPU', 'VM MEM (GB)', 'VM Provisioned (GB)', 'VM Used (GB)', 'Environment']
+RESIZE_COLUMNS = ['VM CPU', 'VM MEM (GB)', 'VM Provisioned (GB)']
+
+# The resources and statistics reported by calculate_resource_profiles
+RESOURCE_COLUMNS = ['VM CPU', 'VM MEM (GB)', 'VM Provisioned (GB)', 'VM Used (GB)']
+RESOURCE_STATISTICS = ['mean', 'median', 'p95']
+
+# The report flags a query to the server may set. Everything else (the inventory, prod labels, disk space ranges...)
+# is fixed when the server starts with --serve
+QUERY_FLAGS = ['get_os_counts', 'output_os_by_version', 'os_name', 'minimum_count', 'get_supported_os', 'get_unsupported_os',
+               'get_disk_space_ranges', 'show_disk_space_by_os', 'sort_by_env', 'get_average_ram', 'resource_profiles']
+# Number of distinct queries the server remembers the answer to
+QUERY_CACHE_SIZE = 256
+# The inventory and arguments the server answers queries from, see serve_reports
+SERVER_STATE = {}
+
+# Charts waiting to be written to --output-dir, see queue_chart
+QUEUED_CHARTS = []
+# How many chunk summaries to hold before folding them together when streaming an inventory
+SUMMARY_COMPACT_INTERVAL = 10
+
+
+def format_dataframe_output(dataFrame, os_name):
     """
     Format the output of a pandas DataFrame containing OS version and count data.
 
     Args:
         dataFrame (pandas.DataFrame): The DataFrame containing OS version and count data.
+        os_name (str): The OS the versions belong to, printed as the heading.
 
     Returns:
         None
 
     Examples:
-        format_dataframe_output(dataFrame)
+        format_dataframe_output(dataFrame, os_name)
     """
 
     if dataFrame.index.nlevels == 2:
@@ -68,6 +138,229 @@ def get_file_type(file_path):
     mime_type = magic.from_file(file_path, mime=True)
     return mime_type
 
+
+def get_file_hash(file_path, cache_dir=DEFAULT_CACHE_DIR, block_size=1024 * 1024):
+    """
+    Returns the sha256 of the file contents. The hash is remembered in the cache index alongside the file size and
+    mtime so that an unchanged file does not need to be re-read on every run.
+
+    Args:
+        file_path (str): The path to the inventory file.
+        cache_dir (str): The directory holding the cache index.
+        block_size (int): The number of bytes to read at a time while hashing.
+
+    Returns:
+        str: The hex digest of the file contents.
+    """
+    file_stat = os.stat(file_path)
+    index_path = os.path.join(cache_dir, CACHE_INDEX_FILE)
+    absolute_path = os.path.abspath(file_path)
+    cache_index = {}
+    if os.path.exists(index_path):
+        try:
+            with open(index_path) as index_file:
+                cache_index = json.load(index_file)
+        except ValueError:
+            cache_index = {}
+
+    entry = cache_index.get(absolute_path)
+    if entry and entry['size'] == file_stat.st_size and entry['mtime'] == file_stat.st_mtime:
+        return entry['sha256']
+
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as inventory_file:
+        for block in iter(lambda: inventory_file.read(block_size), b''):
+            sha.update(block)
+    file_hash = sha.hexdigest()
+
+    cache_index[absolute_path] = {'size': file_stat.st_size, 'mtime': file_stat.st_mtime, 'sha256': file_hash}
+    os.makedirs(cache_dir, exist_ok=True)
+    # Several inventories may be loaded in parallel so never leave a half written index for another process to read
+    temporary_index_path = f"{index_path}.{os.getpid()}"
+    with open(temporary_index_path, 'w') as index_file:
+        json.dump(cache_index, index_file, indent=2)
+    os.replace(temporary_index_path, index_path)
+    return file_hash
+
+
+def get_cache_path(file_hash, cache_dir=DEFAULT_CACHE_DIR, columns=None):
+    """
+    Returns the location of the cached, enriched copy of an inventory file.
+    Custom OS parsing rules change the enrichment so they are part of the cache key, as does loading a subset of the columns.
+
+    Args:
+        file_hash (str): The sha256 of the inventory file.
+        cache_dir (str): The directory holding the cached frames.
+        columns: The columns that were loaded, None for all of them (default: None).
+
+    Returns:
+        str: The path to the parquet file.
+    """
+    cache_name = f"{file_hash}-v{CACHE_VERSION}"
+    if OS_PARSING_RULES:
+        cache_name += "-" + hashlib.sha256(json.dumps(OS_PARSING_RULES, sort_keys=True).encode()).hexdigest()[:12]
+    if columns:
+        cache_name += "-" + hashlib.sha256(json.dumps(sorted(columns)).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{cache_name}.parquet")
+
+
+def read_inventory_file(file_path, columns=None):
+    """
+    Reads a CSV or Excel inventory into a DataFrame based on the MIME type of the file.
+
+    Args:
+        file_path (str): The path to the inventory file.
+        columns: Only read these columns, columns missing from the file are ignored. None reads every column (default: None).
+
+    Returns:
+        pandas.DataFrame: The raw inventory.
+    """
+    usecols = (lambda column: column in columns) if columns else None
+    file_type = get_file_type(file_path)
+    if "csv" in file_type:
+        return pd.read_csv(file_path, usecols=usecols)
+    elif "spreadsheetml" in file_type:
+        return pd.read_excel(file_path, usecols=usecols)
+    print("File passed in was neither a CSV nor an Excel file\nBailing...")
+    exit()
+
+
+def save_cached_inventory(dataFrame, cache_path):
+    """
+    Writes the enriched DataFrame to the cache as parquet, storing the string columns as categoricals.
+
+    Args:
+        dataFrame: The enriched DataFrame.
+        cache_path (str): Where the parquet file should be written.
+
+    Returns:
+        None
+    """
+    cached_df = dataFrame.copy()
+    for column in CATEGORICAL_COLUMNS:
+        if column in cached_df.columns:
+            cached_df[column] = cached_df[column].astype('category')
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    try:
+        # Write to a temporary name first so an interrupted run never leaves a truncated cache behind
+        cached_df.to_parquet(cache_path + ".tmp", index=False)
+        os.replace(cache_path + ".tmp", cache_path)
+    except ImportError:
+        print("Caching the inventory requires pyarrow. Please run")
+        print("pip install pyarrow")
+        print("To enable the cache")
+    except Exception as e:
+        # pyarrow refuses some columns, e.g. object columns mixing numbers and strings. The cache is only a shortcut
+        # so carry on without it
+        print(f"Could not write the inventory cache {cache_path}, skipping it: {e}")
+        if os.path.exists(cache_path + ".tmp"):
+            os.remove(cache_path + ".tmp")
+
+
+def load_cached_inventory(cache_path, compact=False):
+    """
+    Reads an enriched DataFrame back from the cache.
+
+    Args:
+        cache_path (str): The path to the parquet file.
+        compact (bool): Keep the string columns as categoricals (default: False).
+
+    Returns:
+        pandas.DataFrame or None: The cached DataFrame, or None if there is no usable cache.
+    """
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        dataFrame = pd.read_parquet(cache_path)
+    except ImportError:
+        return None
+    if compact:
+        return dataFrame
+    # The report functions expect plain string columns so undo the categoricals used for storage
+    for column in CATEGORICAL_COLUMNS:
+        if column in dataFrame.columns:
+            dataFrame[column] = dataFrame[column].astype(object)
+    return dataFrame
+
+
+def compact_inventory(dataFrame):
+    """
+    Shrinks an inventory in place by storing the string columns in CATEGORICAL_COLUMNS (and 'Source File') as
+    categoricals, and the numeric columns in the smallest integer type. Columns holding fractions or gaps are only
+    stored as float32 when that loses no precision, so the reports are unchanged.
+
+    Args:
+        dataFrame: The inventory DataFrame.
+
+    Returns:
+        The same DataFrame.
+    """
+    for column in dataFrame.columns:
+        values = dataFrame[column]
+        if column in CATEGORICAL_COLUMNS or column == 'Source File':
+            dataFrame[column] = values.astype('category')
+        elif pd.api.types.is_integer_dtype(values):
+            dataFrame[column] = pd.to_numeric(values, downcast='integer')
+        elif pd.api.types.is_float_dtype(values):
+            if values.notna().all() and (values % 1 == 0).all():
+                dataFrame[column] = pd.to_numeric(values, downcast='integer')
+            elif values.astype('float32').astype(values.dtype).equals(values):
+                dataFrame[column] = values.astype('float32')
+    return dataFrame
+
+
+def print_memory_usage(dataFrame):
+    """
+    Prints the memory used by each column of the inventory and in total.
+
+    Args:
+        dataFrame: The inventory DataFrame.
+
+    Returns:
+        None
+    """
+    usage = dataFrame.memory_usage(deep=True, index=False)
+    print("")
+    print(f"Memory usage for {len(dataFrame)} VMs")
+    print('--------------')
+    for column, column_bytes in usage.items():
+        print(f"{column.ljust(32)} {str(dataFrame[column].dtype).ljust(12)} {column_bytes / 1024 ** 2:>10.2f} MB")
+    print(f"{'Total'.ljust(45)} {usage.sum() / 1024 ** 2:>10.2f} MB")
+    print("")
+
+
+def load_inventory(file_path, use_cache=True, cache_dir=DEFAULT_CACHE_DIR, compact=False, columns=None):
+    """
+    Returns the enriched inventory for file_path, reading it from the cache when the file has not changed
+    since the last run.
+
+    Args:
+        file_path (str): The path to the CSV or Excel inventory.
+        use_cache (bool): Whether the on-disk cache should be consulted and updated (default: True).
+        cache_dir (str): The directory holding the cached frames.
+        compact (bool): Shrink the inventory with compact_inventory (default: False).
+        columns: Only load these columns, None loads every column (default: None).
+
+    Returns:
+        pandas.DataFrame: The inventory with the OS Name, OS Version and Architecture columns added.
+    """
+    if not use_cache:
+        dataFrame = read_inventory_file(file_path, columns=columns)
+        add_extra_columns(dataFrame)
+        return compact_inventory(dataFrame) if compact else dataFrame
+
+    cache_path = get_cache_path(get_file_hash(file_path, cache_dir=cache_dir), cache_dir=cache_dir, columns=columns)
+    dataFrame = load_cached_inventory(cache_path, compact=compact)
+    if dataFrame is not None:
+        return dataFrame
+
+    dataFrame = read_inventory_file(file_path, columns=columns)
+    add_extra_columns(dataFrame)
+    if compact:
+        compact_inventory(dataFrame)
+    save_cached_inventory(dataFrame, cache_path)
+    return dataFrame
+
 def find_fuzzy_match_in_dataframe(df, text):
     """
     Finds a fuzzy match for the given text in the column headings of a DataFrame.
@@ -87,31 +380,75 @@ def find_fuzzy_match_in_dataframe(df, text):
     
     return None
 
-def add_extra_columns(dataFrame):
+def load_os_parsing_rules(rules_path):
     """
-    Adds extra columns to the DataFrame by extracting OS name, version, and architecture information from the 'VM OS' column using a regex pattern.
+    Loads vendor specific OS parsing rules from a JSON file and puts them ahead of any rules already loaded.
+    The file should contain a list of rules in the format described above OS_PARSING_RULES, i.e.
+    [{"pattern": "^(?P<OS_Name>CentOS) (?P<OS_Version>[0-9/]+) [(](?P<Architecture>.*-bit)[)]"}]
+
+    Args:
+        rules_path (str): The path to the JSON file.
+
+    Returns:
+        None
+    """
+    with open(rules_path) as rules_file:
+        rules = json.load(rules_file)
+    OS_PARSING_RULES[:0] = rules
+    # Anything parsed with the previous rules is no longer valid
+    parse_os_string.cache_clear()
+
+
+@functools.lru_cache(maxsize=OS_PARSE_CACHE_SIZE)
+def parse_os_string(vm_os):
+    """
+    Splits a single 'VM OS' string into its OS name, version and architecture. The vendor specific rules in
+    OS_PARSING_RULES are tried first and DEFAULT_OS_PATTERN last. Results are memoized since an inventory only
+    holds a few hundred distinct OS strings.
+
+    Args:
+        vm_os (str): The value from the 'VM OS' column.
+
+    Returns:
+        tuple: (OS Name, OS Version, Architecture). Any part that could not be determined is None.
+    """
+    for rule in OS_PARSING_RULES + [{'pattern': DEFAULT_OS_PATTERN}]:
+        match = re.search(rule['pattern'], vm_os)
+        if match:
+            groups = match.groupdict()
+            return tuple(rule.get(column, groups.get(group)) for column, group in
+                         [('OS Name', 'OS_Name'), ('OS Version', 'OS_Version'), ('Architecture', 'Architecture')])
+    return (None, None, None)
+
+
+def add_extra_columns(dataFrame, output_path='/tmp/Inventory_VMs_redhat_06_27_24.csv'):
+    """
+    Adds extra columns to the DataFrame by extracting OS name, version, and architecture information from the 'VM OS' column.
+    Each distinct 'VM OS' string is only parsed once and the result is mapped back onto every row.
 
     Args:
         dataFrame: DataFrame containing VM OS information.
+        output_path: Where to save a copy of the modified DataFrame. None skips saving (default: '/tmp/Inventory_VMs_redhat_06_27_24.csv').
 
     Returns:
         None
     """
     # Only attempt to add columns if the 3 columns don't already exist
     if not all(col in dataFrame.columns for col in ['OS Name', 'OS Version', 'Architecture']):
-        # Define a regex pattern to extract OS name, version, and architecture information
-        pattern = r"^(?P<OS_Name>.*?)\s*(?P<OS_Version>(?:\d+\s+\w+|\w+)\s*(?:or later)?\s*)?\s*\((?P<Architecture>.*?64-bit|.*?32-bit)\)"
-        
-        # Extract the matched groups using str.extract and assign them to new columns in the DataFrame
-        dataFrame[['OS Name', 'OS Version', 'Architecture']] = dataFrame['VM OS'].str.extract(pattern)
-        
-        # Fill NaN values in the newly created columns with the original 'VM OS' column values
-        dataFrame['OS Name'].fillna(dataFrame['VM OS'], inplace=True)
-        dataFrame['OS Version'].fillna(dataFrame['VM OS'], inplace=True)
-        dataFrame['Architecture'].fillna(dataFrame['VM OS'], inplace=True)
-        
+        # codes maps every row to its position in unique_os_strings, missing values get -1
+        codes, unique_os_strings = pd.factorize(dataFrame['VM OS'])
+        parsed_os_strings = [parse_os_string(str(vm_os)) for vm_os in unique_os_strings]
+
+        for position, column in enumerate(['OS Name', 'OS Version', 'Architecture']):
+            # Fall back to the original 'VM OS' value for anything the parser could not determine.
+            # The trailing NaN is what rows with a missing 'VM OS' (code -1) pick up
+            values = [parsed[position] if parsed[position] is not None else vm_os
+                      for parsed, vm_os in zip(parsed_os_strings, unique_os_strings)]
+            dataFrame[column] = np.array(values + [np.nan], dtype=object)[codes]
+
         # Save the modified DataFrame to a CSV file
-        dataFrame.to_csv('/tmp/Inventory_VMs_redhat_06_27_24.csv', index=False)
+        if output_path:
+            dataFrame.to_csv(output_path, index=False)
     else:
         print("All columns already exist")
 
@@ -120,12 +457,575 @@ def categorize_environment(environment, *keywords):
     # Dummy implementation for demonstration
     return environment
 
-def generate_supported_OS_counts(dataFrame, *env_keywords, environment_filter=None):
+def build_environment_matcher(*env_keywords):
+    """
+    Compiles the prod keywords into a single regex so each environment is checked against every keyword in one search.
+
+    Args:
+        *env_keywords: Keywords denoting prod environments.
+
+    Returns:
+        A compiled regex, or None if no keywords were given.
+    """
+    if not env_keywords:
+        return None
+    # Longest first so that overlapping keywords match the most specific one
+    keywords = sorted(set(env_keywords), key=len, reverse=True)
+    return re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+
+
+def classify_environments(environments, *env_keywords):
+    """
+    Categorizes every value in the 'Environment' column as 'prod' or 'non-prod' (or 'all envs' when no keywords are given).
+    Each distinct environment is only classified once and the result is mapped back onto every row.
+
+    Args:
+        environments: pandas Series holding the 'Environment' column.
+        *env_keywords: Keywords denoting prod environments.
+
+    Returns:
+        Categorical pandas Series aligned with environments.
+    """
+    # if the user has not passed in any arguments denoting which things should be classified as prod
+    # assume they want a count of OS' across all environments
+    matcher = build_environment_matcher(*env_keywords)
+    if matcher is None:
+        return pd.Series(pd.Categorical(['all envs'] * len(environments), categories=ENVIRONMENT_TYPES),
+                         index=environments.index)
+
+    # codes maps every row to its position in unique_environments, missing environments get -1 and are non-prod
+    codes, unique_environments = pd.factorize(environments)
+    environment_type_codes = np.array([0 if matcher.search(str(environment)) else 1 for environment in unique_environments] + [1])
+    return pd.Series(pd.Categorical.from_codes(environment_type_codes[codes], categories=ENVIRONMENT_TYPES),
+                     index=environments.index)
+
+
+def prepare_report_frame(dataFrame, *env_keywords, show_disk_in_tb=False, frameHeading="VM Provisioned (GB)", disk_space_edges=None, disk_space_limits=None):
     """
-    Generates a horizontal bar chart displaying the distribution of supported operating systems based on their frequency in the DataFrame.
+    Adds the columns shared by every report so that they only have to be computed once per run.
+    The environment type (prod/non-prod/all envs) is stored in 'Environment Type' and the disk bucket in 'Disk Space Range'.
 
     Args:
-        dataFrame: DataFrame containing OS information.
+        dataFrame: The enriched inventory DataFrame.
+        *env_keywords: Keywords denoting prod environments.
+        show_disk_in_tb: Boolean flag to use the terabyte disk space ranges (default: False).
+        frameHeading: The column to bucket the disk space on (default: "VM Provisioned (GB)").
+        disk_space_edges: User defined upper bounds for the disk space ranges (default: None).
+        disk_space_limits: (smallest, largest) disk used to label the first and last disk space range (default: None).
+
+    Returns:
+        A copy of the DataFrame with the extra columns.
+    """
+    report_df = dataFrame.copy()
+    report_df['Environment Type'] = classify_environments(report_df['Environment'], *env_keywords)
+
+    disk_space_buckets, _ = assign_disk_space_ranges(report_df, show_disk_in_tb=show_disk_in_tb, frameHeading=frameHeading,
+                                                     disk_space_edges=disk_space_edges, disk_space_limits=disk_space_limits)
+    report_df['Disk Space Range'] = disk_space_buckets.astype(object)
+    return report_df
+
+
+def summarize_inventory(report_df):
+    """
+    Collapses the prepared inventory into one row per OS Name, OS Version, Environment, Environment Type and Disk Space Range.
+    All of the OS, disk and RAM reports are derived from this summary instead of re-scanning every VM.
+
+    Args:
+        report_df: DataFrame returned by prepare_report_frame.
+
+    Returns:
+        DataFrame with 'Count', 'Total RAM (GB)' and 'RAM Count' columns for each group.
+    """
+    summary = report_df.groupby(SUMMARY_COLUMNS, dropna=False, observed=True, sort=False).agg(
+        **{'Count': ('VM OS', 'size'),
+           'Total RAM (GB)': ('VM MEM (GB)', 'sum'),
+           'RAM Count': ('VM MEM (GB)', 'count')})
+    summary = summary.reset_index()
+    # The summary is small, plain strings keep unobserved categories (i.e. environment types) out of the pivoted report tables
+    for column in SUMMARY_COLUMNS:
+        if isinstance(summary[column].dtype, pd.CategoricalDtype):
+            summary[column] = summary[column].astype(object)
+    return summary
+
+
+def expand_inventory_paths(file_patterns):
+    """
+    Expands the file names and glob patterns passed on the command line into a list of inventory files.
+
+    Args:
+        file_patterns: List of file paths or glob patterns such as '/data/rvtools/*.xlsx'.
+
+    Returns:
+        Sorted list of unique file paths.
+    """
+    file_paths = []
+    for pattern in file_patterns:
+        matches = glob.glob(os.path.expanduser(pattern)) or [pattern]
+        for file_path in sorted(matches):
+            if file_path not in file_paths:
+                file_paths.append(file_path)
+    return file_paths
+
+
+def load_tagged_inventory(file_path, use_cache=True, cache_dir=DEFAULT_CACHE_DIR, os_parsing_rules=None, compact=False, columns=None):
+    """
+    Loads a single inventory and records which file each row came from in the 'Source File' column.
+    This is the unit of work handed to each process by load_inventories.
+
+    Args:
+        file_path (str): The path to the CSV or Excel inventory.
+        use_cache (bool): Whether the on-disk cache should be consulted and updated (default: True).
+        cache_dir (str): The directory holding the cached frames.
+        os_parsing_rules: The OS_PARSING_RULES of the parent process, which a spawned process would not otherwise see (default: None).
+        compact (bool): Shrink the inventory with compact_inventory (default: False).
+        columns: Only load these columns, None loads every column (default: None).
+
+    Returns:
+        pandas.DataFrame: The enriched inventory.
+    """
+    if os_parsing_rules and os_parsing_rules != OS_PARSING_RULES:
+        OS_PARSING_RULES[:] = os_parsing_rules
+        parse_os_string.cache_clear()
+    dataFrame = load_inventory(file_path, use_cache=use_cache, cache_dir=cache_dir, compact=compact, columns=columns)
+    dataFrame['Source File'] = os.path.basename(file_path)
+    if compact:
+        dataFrame['Source File'] = dataFrame['Source File'].astype('category')
+    return dataFrame
+
+
+def load_inventories(file_paths, use_cache=True, cache_dir=DEFAULT_CACHE_DIR, workers=None, compact=False, columns=None):
+    """
+    Loads several inventories (i.e. one RVTools export per vCenter) in a process pool and concatenates them.
+    Parsing Excel files is CPU bound so each file is handled by its own process.
+
+    Args:
+        file_paths: List of CSV or Excel inventories.
+        use_cache (bool): Whether the on-disk cache should be consulted and updated (default: True).
+        cache_dir (str): The directory holding the cached frames.
+        workers (int): The maximum number of processes to use. Defaults to the number of CPUs.
+        compact (bool): Shrink the inventory with compact_inventory (default: False).
+        columns: Only load these columns, None loads every column (default: None).
+
+    Returns:
+        pandas.DataFrame: The combined inventory with a 'Source File' column.
+    """
+    if len(file_paths) == 1:
+        return load_tagged_inventory(file_paths[0], use_cache=use_cache, cache_dir=cache_dir, compact=compact, columns=columns)
+
+    workers = min(workers or os.cpu_count() or 1, len(file_paths))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(load_tagged_inventory, file_path, use_cache, cache_dir, list(OS_PARSING_RULES), compact, columns)
+                   for file_path in file_paths]
+        inventories = [future.result() for future in futures]
+    dataFrame = pd.concat(inventories, ignore_index=True)
+    # Categoricals with different categories are concatenated as plain strings, and the numeric types may have been widened
+    return compact_inventory(dataFrame) if compact else dataFrame
+
+
+def combine_summaries(summaries):
+    """
+    Adds together summaries produced from different parts of an inventory.
+
+    Args:
+        summaries: List of DataFrames returned by summarize_inventory.
+
+    Returns:
+        A single summary DataFrame.
+    """
+    combined = pd.concat(summaries, ignore_index=True)
+    return combined.groupby(SUMMARY_COLUMNS, dropna=False, observed=True, sort=False).sum().reset_index()
+
+
+def stream_inventory_summary(file_paths, *env_keywords, chunksize=100000, show_disk_in_tb=False, frameHeading="VM Provisioned (GB)", disk_space_edges=None):
+    """
+    Builds the inventory summary by reading the CSVs chunksize rows at a time, so memory use is bounded by the
+    chunk size and the number of distinct groups rather than by the size of the files.
+
+    Args:
+        file_paths: List of CSV inventories.
+        *env_keywords: Keywords denoting prod environments.
+        chunksize (int): The number of rows to read at a time (default: 100000).
+        show_disk_in_tb: Boolean flag to use the terabyte disk space ranges (default: False).
+        frameHeading: The column to bucket the disk space on (default: "VM Provisioned (GB)").
+        disk_space_edges: User defined upper bounds for the disk space ranges (default: None).
+
+    Returns:
+        DataFrame in the same shape as summarize_inventory.
+    """
+    # Every chunk is labelled against the same placeholder limits so the disk space ranges line up between chunks.
+    # The first and last labels are swapped for the real smallest and largest disk once the whole file has been read
+    min_disk_space = math.inf
+    max_disk_space = -math.inf
+    partial_summaries = []
+    chunks = (chunk for file_path in file_paths for chunk in pd.read_csv(file_path, chunksize=chunksize))
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        add_extra_columns(chunk, output_path=None)
+        disk_space = get_disk_space_in_gb(chunk, frameHeading=frameHeading)
+        min_disk_space = min(min_disk_space, disk_space.min())
+        max_disk_space = max(max_disk_space, disk_space.max())
+        report_df = prepare_report_frame(chunk, *env_keywords, show_disk_in_tb=show_disk_in_tb, frameHeading=frameHeading,
+                                         disk_space_edges=disk_space_edges, disk_space_limits=DISK_SPACE_PLACEHOLDER_LIMITS)
+        partial_summaries.append(summarize_inventory(report_df))
+        # Fold the partial summaries together periodically so that they don't grow with the file
+        if len(partial_summaries) >= SUMMARY_COMPACT_INTERVAL:
+            partial_summaries = [combine_summaries(partial_summaries)]
+
+    if not partial_summaries:
+        # The files only have a header, there is nothing to summarize
+        return pd.DataFrame(columns=SUMMARY_COLUMNS + ['Count', 'Total RAM (GB)', 'RAM Count'])
+    summary = combine_summaries(partial_summaries)
+    return relabel_disk_space_ranges(summary, min_disk_space, max_disk_space, show_disk_in_tb=show_disk_in_tb,
+                                     disk_space_edges=disk_space_edges)
+
+
+def relabel_disk_space_ranges(summary, min_disk_space, max_disk_space, show_disk_in_tb=False, disk_space_edges=None):
+    """
+    Swaps the placeholder first and last disk space range labels of a summary built with
+    DISK_SPACE_PLACEHOLDER_LIMITS for ones based on the real smallest and largest disk.
+
+    Args:
+        summary: DataFrame returned by summarize_inventory.
+        min_disk_space: The smallest disk (in GB) in the inventory.
+        max_disk_space: The largest disk (in GB) in the inventory.
+        show_disk_in_tb: Boolean flag to use the terabyte disk space ranges (default: False).
+        disk_space_edges: User defined upper bounds for the disk space ranges (default: None).
+
+    Returns:
+        A relabelled copy of the summary.
+    """
+    edges = get_disk_space_edges(show_disk_in_tb=show_disk_in_tb, disk_space_edges=disk_space_edges)
+    placeholder_ranges = list(zip([DISK_SPACE_PLACEHOLDER_LIMITS[0]] + [edge + 1 for edge in edges], edges + [DISK_SPACE_PLACEHOLDER_LIMITS[1]]))
+    disk_space_ranges = list(zip([int(min_disk_space)] + [edge + 1 for edge in edges], edges + [int(math.ceil(max_disk_space))]))
+    relabel = {f'{old[0]}-{old[1]} GB': f'{new[0]}-{new[1]} GB' for old, new in zip(placeholder_ranges, disk_space_ranges)}
+    summary = summary.copy()
+    summary['Disk Space Range'] = summary['Disk Space Range'].map(relabel)
+    return summary
+
+
+def negate_summary(summary):
+    """
+    Flips the sign of the counts and totals in a summary so that combine_summaries subtracts it.
+
+    Args:
+        summary: DataFrame returned by summarize_inventory.
+
+    Returns:
+        A negated copy of the summary.
+    """
+    summary = summary.copy()
+    for column in ['Count', 'Total RAM (GB)', 'RAM Count']:
+        summary[column] = -summary[column]
+    return summary
+
+
+def get_snapshot_settings(*env_keywords, show_disk_in_tb=False, frameHeading="VM Provisioned (GB)", disk_space_edges=None):
+    """
+    Returns everything that a snapshot's summary depends on besides the inventory itself. A snapshot summary can only
+    be updated incrementally when these match the current run.
+
+    Args:
+        *env_keywords: Keywords denoting prod environments.
+        show_disk_in_tb: Boolean flag to use the terabyte disk space ranges (default: False).
+        frameHeading: The column to bucket the disk space on (default: "VM Provisioned (GB)").
+        disk_space_edges: User defined upper bounds for the disk space ranges (default: None).
+
+    Returns:
+        dict that can be stored as JSON.
+    """
+    return {'cache_version': CACHE_VERSION,
+            'env_keywords': sorted(env_keywords),
+            'disk_space_column': frameHeading,
+            'disk_space_edges': get_disk_space_edges(show_disk_in_tb=show_disk_in_tb, disk_space_edges=disk_space_edges),
+            'os_parsing_rules': OS_PARSING_RULES}
+
+
+def save_snapshot(dataFrame, raw_summary, settings, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Records the enriched inventory and its summary (labelled with DISK_SPACE_PLACEHOLDER_LIMITS) in the snapshot store
+    so that the next run can be diffed against it.
+
+    Args:
+        dataFrame: The enriched inventory.
+        raw_summary: DataFrame returned by summarize_inventory for the same inventory.
+        settings: dict returned by get_snapshot_settings.
+        cache_dir (str): The directory holding the snapshot store.
+
+    Returns:
+        str: The timestamp identifying the snapshot.
+    """
+    snapshot_dir = os.path.join(cache_dir, SNAPSHOT_DIR_NAME)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    inventory_file = f"{timestamp}-inventory.parquet"
+    summary_file = f"{timestamp}-summary.parquet"
+    try:
+        save_cached_inventory(dataFrame, os.path.join(snapshot_dir, inventory_file))
+        raw_summary.to_parquet(os.path.join(snapshot_dir, summary_file), index=False)
+    except ImportError:
+        print("Saving snapshots requires pyarrow. Please run")
+        print("pip install pyarrow")
+        return None
+
+    index_path = os.path.join(snapshot_dir, CACHE_INDEX_FILE)
+    snapshots = []
+    if os.path.exists(index_path):
+        with open(index_path) as index_file:
+            snapshots = json.load(index_file)
+    snapshots.append({'timestamp': timestamp, 'inventory': inventory_file, 'summary': summary_file, 'settings': settings})
+    with open(index_path, 'w') as index_file:
+        json.dump(snapshots, index_file, indent=2)
+    return timestamp
+
+
+def load_latest_snapshot(cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Loads the most recent snapshot from the snapshot store.
+
+    Args:
+        cache_dir (str): The directory holding the snapshot store.
+
+    Returns:
+        dict with 'timestamp', 'inventory', 'summary' and 'settings', or None if no snapshot has been saved.
+    """
+    snapshot_dir = os.path.join(cache_dir, SNAPSHOT_DIR_NAME)
+    index_path = os.path.join(snapshot_dir, CACHE_INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path) as index_file:
+        snapshots = json.load(index_file)
+    if not snapshots:
+        return None
+    latest = snapshots[-1]
+    inventory = load_cached_inventory(os.path.join(snapshot_dir, latest['inventory']))
+    if inventory is None:
+        return None
+    summary = pd.read_parquet(os.path.join(snapshot_dir, latest['summary']))
+    return {'timestamp': latest['timestamp'], 'inventory': inventory, 'summary': summary, 'settings': latest['settings']}
+
+
+def diff_inventories(previous_df, current_df, id_column='VM', extra_columns=()):
+    """
+    Compares two inventories VM by VM using id_column as the identity of each VM.
+
+    Args:
+        previous_df: The enriched inventory from the snapshot.
+        current_df: The enriched inventory being reported on.
+        id_column: The column which uniquely identifies a VM (default: 'VM').
+        extra_columns: Columns compared on top of DIFF_COLUMNS, such as the --disk-space-column the summary is built from.
+
+    Returns:
+        dict with the 'added' and 'removed' VMs, side by side 'resized' and 'os_changed' tables, the 'outgoing' rows
+        (previous version of anything removed or changed) and 'incoming' rows (current version of anything added or
+        changed), and 'duplicates' which is True if id_column does not uniquely identify every VM.
+    """
+    duplicates = previous_df[id_column].duplicated().any() or current_df[id_column].duplicated().any()
+    previous = previous_df.drop_duplicates(id_column, keep='last').set_index(id_column)
+    current = current_df.drop_duplicates(id_column, keep='last').set_index(id_column)
+
+    added_ids = current.index.difference(previous.index)
+    removed_ids = previous.index.difference(current.index)
+    common_ids = current.index.intersection(previous.index)
+
+    compare_columns = [column for column in dict.fromkeys(DIFF_COLUMNS + list(extra_columns))
+                       if column in previous.columns and column in current.columns]
+    # Plain objects so that categoricals with different categories can be compared
+    previous_common = previous.loc[common_ids, compare_columns].astype(object)
+    current_common = current.loc[common_ids, compare_columns].astype(object)
+    # Two missing values are not a change
+    differs = (previous_common != current_common) & ~(previous_common.isna() & current_common.isna())
+    changed_ids = common_ids[differs.any(axis=1).to_numpy()]
+
+    resize_columns = [column for column in RESIZE_COLUMNS if column in compare_columns]
+    resized_ids = common_ids[differs[resize_columns].any(axis=1).to_numpy()]
+    os_changed_ids = common_ids[differs['VM OS'].to_numpy()] if 'VM OS' in compare_columns else common_ids[:0]
+
+    return {'added': current.loc[added_ids].reset_index(),
+            'removed': previous.loc[removed_ids].reset_index(),
+            'resized': pd.concat({'previous': previous_common.loc[resized_ids, resize_columns],
+                                  'current': current_common.loc[resized_ids, resize_columns]}, axis=1),
+            'os_changed': pd.concat({'previous': previous_common.loc[os_changed_ids, ['VM OS']],
+                                     'current': current_common.loc[os_changed_ids, ['VM OS']]}, axis=1),
+            'outgoing': previous.loc[removed_ids.union(changed_ids)].reset_index(),
+            'incoming': current.loc[added_ids.union(changed_ids)].reset_index(),
+            'duplicates': duplicates}
+
+
+def print_inventory_diff(diff, snapshot_timestamp, id_column='VM', max_rows=20):
+    """
+    Prints the number of VMs added, removed, resized or moved to a different OS since the snapshot, along with the first few of each.
+
+    Args:
+        diff: dict returned by diff_inventories.
+        snapshot_timestamp: The timestamp of the snapshot being compared against.
+        id_column: The column which uniquely identifies a VM (default: 'VM').
+        max_rows: How many VMs to list for each type of change (default: 20).
+
+    Returns:
+        None
+    """
+    print("")
+    print(f"Inventory changes since snapshot {snapshot_timestamp}")
+    print('--------------')
+    for heading, key in [('VMs added', 'added'), ('VMs removed', 'removed'), ('VMs resized', 'resized'), ('OS changed', 'os_changed')]:
+        print(f"{heading.ljust(32)} {len(diff[key])}")
+    if diff['duplicates']:
+        print(f"\nWARNING: {id_column} does not uniquely identify every VM, only the last of each duplicate was compared")
+
+    for heading, key in [('Added', 'added'), ('Removed', 'removed')]:
+        if not diff[key].empty:
+            print(f"\n{heading}")
+            print(diff[key][[id_column] + [column for column in ['VM OS', 'Environment'] if column in diff[key].columns]].head(max_rows).to_string(index=False))
+    for heading, key in [('Resized', 'resized'), ('OS changed', 'os_changed')]:
+        if not diff[key].empty:
+            print(f"\n{heading}")
+            print(diff[key].head(max_rows).to_string())
+    print("")
+
+
+def update_summary(previous_raw_summary, diff, *env_keywords, show_disk_in_tb=False, frameHeading="VM Provisioned (GB)", disk_space_edges=None):
+    """
+    Brings a snapshot's summary up to date by subtracting the outgoing rows and adding the incoming rows of a diff,
+    so only the VMs that changed are prepared and summarized again.
+
+    Args:
+        previous_raw_summary: The snapshot's summary, labelled with DISK_SPACE_PLACEHOLDER_LIMITS.
+        diff: dict returned by diff_inventories.
+        *env_keywords: Keywords denoting prod environments.
+        show_disk_in_tb: Boolean flag to use the terabyte disk space ranges (default: False).
+        frameHeading: The column to bucket the disk space on (default: "VM Provisioned (GB)").
+        disk_space_edges: User defined upper bounds for the disk space ranges (default: None).
+
+    Returns:
+        The updated summary, still labelled with DISK_SPACE_PLACEHOLDER_LIMITS.
+    """
+    partial_summaries = [previous_raw_summary]
+    for key, negate in [('outgoing', True), ('incoming', False)]:
+        if diff[key].empty:
+            continue
+        report_df = prepare_report_frame(diff[key], *env_keywords, show_disk_in_tb=show_disk_in_tb, frameHeading=frameHeading,
+                                         disk_space_edges=disk_space_edges, disk_space_limits=DISK_SPACE_PLACEHOLDER_LIMITS)
+        partial_summary = summarize_inventory(report_df)
+        partial_summaries.append(negate_summary(partial_summary) if negate else partial_summary)
+    summary = combine_summaries(partial_summaries)
+    return summary[summary['Count'] != 0].reset_index(drop=True)
+
+
+def get_os_name_counts(summary):
+    """
+    Returns the number of VMs per OS Name in descending order, equivalent to value_counts on the raw inventory.
+
+    Args:
+        summary: DataFrame returned by summarize_inventory.
+
+    Returns:
+        pandas.Series indexed by OS Name.
+    """
+    counts = summary.groupby('OS Name')['Count'].sum().sort_values(ascending=False)
+    counts.name = 'count'
+    return counts
+
+
+def queue_chart(data, file_name, kind='barh', title=None, xlabel=None, ylabel=None, colors=None, log_scale=False, count_ticks=False, figsize=None):
+    """
+    Records a chart to be written to --output-dir by render_queued_charts instead of drawing it straight away.
+    Only the (already aggregated) data and labels are stored so the chart can be drawn in another process.
+
+    Args:
+        data: pandas Series or DataFrame to plot.
+        file_name: Name of the image without the extension. Anything other than letters, numbers, '.', '-' and '_' is replaced.
+        kind: 'barh', 'bar' or 'pie' (default: 'barh').
+        title: The chart title (default: None).
+        xlabel: The x axis label (default: None).
+        ylabel: The y axis label (default: None).
+        colors: Colors passed through to matplotlib (default: None).
+        log_scale: Use a log scale on the x axis (default: False).
+        count_ticks: Label the x axis with the smallest, middle and largest counts (default: False).
+        figsize: The figure size in inches (default: None).
+
+    Returns:
+        None
+    """
+    file_name = re.sub(r'[^A-Za-z0-9._-]+', '_', file_name)
+    queued_names = {chart['file_name'] for chart in QUEUED_CHARTS}
+    unique_name = file_name
+    suffix = 1
+    while unique_name in queued_names:
+        suffix += 1
+        unique_name = f"{file_name}_{suffix}"
+    QUEUED_CHARTS.append({'data': data, 'file_name': unique_name, 'kind': kind, 'title': title, 'xlabel': xlabel, 'ylabel': ylabel,
+                          'colors': colors, 'log_scale': log_scale, 'count_ticks': count_ticks, 'figsize': figsize})
+
+
+def render_chart(chart, output_dir, image_format='png'):
+    """
+    Draws a single queued chart with the Agg backend and saves it to output_dir.
+
+    Args:
+        chart: A dict created by queue_chart.
+        output_dir: The directory to write the image to.
+        image_format: 'png' or 'svg' (default: 'png').
+
+    Returns:
+        str: The path of the written image.
+    """
+    plt.switch_backend('Agg')
+    data = chart['data']
+    fig, ax = plt.subplots(figsize=chart['figsize'])
+    if chart['kind'] == 'pie':
+        ax.pie(data, labels=data.index, colors=chart['colors'], autopct='%1.1f%%')
+    else:
+        data.plot(kind=chart['kind'], rot=45, color=chart['colors'], ax=ax)
+    if chart['log_scale']:
+        ax.set_xscale('log')
+        ax.xaxis.set_major_formatter(ticker.ScalarFormatter())
+    # This sets the ticks on the bottom so that very large numbers can be represented next to smaller numbers while still having a visible bar
+    if chart['count_ticks'] and len(data):
+        middle = data.iloc[len(data)//2]
+        ax.set_xticks([data.iloc[0] - (data.iloc[0] % 100), middle - (middle % 100), data.iloc[-1]])
+    if chart['title']:
+        ax.set_title(chart['title'])
+    if chart['xlabel']:
+        ax.set_xlabel(chart['xlabel'])
+    if chart['ylabel']:
+        ax.set_ylabel(chart['ylabel'])
+
+    image_path = os.path.join(output_dir, f"{chart['file_name']}.{image_format}")
+    fig.savefig(image_path, bbox_inches='tight')
+    plt.close(fig)
+    return image_path
+
+
+def render_queued_charts(output_dir, image_format='png', workers=None):
+    """
+    Writes every chart recorded by queue_chart to output_dir, spreading the rendering across a process pool.
+
+    Args:
+        output_dir: The directory to write the images to. It is created if it does not exist.
+        image_format: 'png' or 'svg' (default: 'png').
+        workers (int): The maximum number of processes to use. Defaults to the number of CPUs.
+
+    Returns:
+        List of the written image paths.
+    """
+    if not QUEUED_CHARTS:
+        return []
+    os.makedirs(output_dir, exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, len(QUEUED_CHARTS))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        image_paths = list(executor.map(render_chart, QUEUED_CHARTS, itertools.repeat(output_dir), itertools.repeat(image_format),
+                                        chunksize=max(1, len(QUEUED_CHARTS) // (workers * 4))))
+    del QUEUED_CHARTS[:]
+    return image_paths
+
+
+def generate_supported_OS_counts(summary, *env_keywords, environment_filter=None):
+    """
+    Generates a horizontal bar chart displaying the distribution of supported operating systems based on their frequency in the inventory summary.
+
+    Args:
+        summary: DataFrame returned by summarize_inventory.
         *env_keywords: Additional environment keywords.
         environment_filter: Filter for specific environments.
 
@@ -133,17 +1033,12 @@ def generate_supported_OS_counts(dataFrame, *env_keywords, environment_filter=No
         None
     """
 
-    data_cp = dataFrame.copy()
-    if environment_filter and env_keywords:
-        data_cp['Environment'] = dataFrame['Environment'].apply(categorize_environment, args=env_keywords)
-    
+    data_cp = summary
     if environment_filter and environment_filter not in ["all", "both"]:
-        data_cp = data_cp[data_cp['Environment'] == environment_filter]
+        data_cp = data_cp[data_cp['Environment Type'] == environment_filter]
     elif environment_filter == "both":
-        data_cp = data_cp.groupby(['OS Name', 'Environment']).size().unstack().fillna(0)
-        
-    # Calculate the frequency of each unique OS name
-    
+        data_cp = data_cp.groupby(['OS Name', 'Environment Type'])['Count'].sum().unstack().fillna(0).rename_axis(columns='Environment')
+
     if data_cp.empty:
         print(f"None found in {environment_filter} \n")
         return
@@ -156,27 +1051,30 @@ def generate_supported_OS_counts(dataFrame, *env_keywords, environment_filter=No
         # Add more OS names and colors as needed
     }
 
-    if environment_filter and environment_filter != "both":
-        filtered_counts = data_cp['OS Name'].value_counts()
+    if environment_filter != "both":
+        filtered_counts = get_os_name_counts(data_cp)
     # If we are looking at both prod/non-prod we don't want an OS Name count
     else:
         filtered_counts = data_cp
 
     filtered_counts = filtered_counts[filtered_counts.index.isin(supported_os_colors.keys())]
-    colors = [supported_os_colors[os] for os in filtered_counts.index]
     # We want to use the official OS colours when there is only 1 bar per os
-    if environment_filter and environment_filter != "both":
-        filtered_counts.plot(kind='barh', rot=45, color=colors)
     # Remove the color coding if we are comparing both environments as it doesn't look correct
+    colors = None
+    if environment_filter and environment_filter != "both":
+        colors = [supported_os_colors[os] for os in filtered_counts.index]
+    if environment_filter not in ['prod', 'non-prod']:
+        title = 'Supported Operating Systems For All Environments'
     else:
-        filtered_counts.plot(kind='barh', rot=45)
-    
-    if args.generate_graphs:
+        title = f'Supported Operating Systems for {environment_filter.title()}'
+
+    if args.output_dir:
+        queue_chart(filtered_counts, f'supported_os_{environment_filter or "all"}', title=title, xlabel='Count', ylabel='Operating Systems',
+                    colors=colors, log_scale=True, count_ticks=environment_filter != "both")
+    elif args.generate_graphs:
+        filtered_counts.plot(kind='barh', rot=45, color=colors)
         # Set titles and labels for the plot
-        if environment_filter not in ['prod', 'non-prod']:
-            plt.title('Supported Operating Systems For All Environments')
-        else:
-            plt.title(f'Supported Operating Systems for {environment_filter.title()}')
+        plt.title(title)
         plt.ylabel('Operating Systems')
         plt.xlabel('Count')
         plt.xscale('log')
@@ -190,19 +1088,19 @@ def generate_supported_OS_counts(dataFrame, *env_keywords, environment_filter=No
         plt.show(block=True)
         plt.close()
 
-def generate_unsupported_OS_counts(dataFrame):
+def generate_unsupported_OS_counts(summary):
     """
-    Generates a pie chart displaying the distribution of unsupported operating systems based on their frequency in the DataFrame.
+    Generates a pie chart displaying the distribution of unsupported operating systems based on their frequency in the inventory summary.
 
     Args:
-        dataFrame: DataFrame containing OS information.
+        summary: DataFrame returned by summarize_inventory.
 
     Returns:
         None
     """
 
     # Calculate the frequency of each unique OS name
-    counts = dataFrame['OS Name'].value_counts()
+    counts = get_os_name_counts(summary)
 
     # Define specific colors for identified supported OS names
     supported_os = ['Red Hat Enterprise Linux', 'SUSE Linux Enterprise', 'Microsoft Windows Server', 'Microsoft Windows']
@@ -219,7 +1117,9 @@ def generate_unsupported_OS_counts(dataFrame):
     print(unsupported_counts)
     # Create a pie chart for unsupported OS distribution
     random_colors = cm.rainbow(np.linspace(0, 1, len(unsupported_counts)))
-    if args.generate_graphs:
+    if args.output_dir:
+        queue_chart(unsupported_counts, 'unsupported_os', kind='pie', title='Unsupported Operating System Distribution', colors=random_colors)
+    elif args.generate_graphs:
         plt.pie(unsupported_counts, labels=unsupported_counts.index, colors=random_colors, autopct='%1.1f%%')
         plt.title('Unsupported Operating System Distribution')
 
@@ -227,12 +1127,12 @@ def generate_unsupported_OS_counts(dataFrame):
         plt.show(block=True)
         plt.close()
 
-def generate_all_OS_counts(dataFrame, minimumCount=500, maximumCount=99999):
+def generate_all_OS_counts(summary, minimumCount=500, maximumCount=99999):
     """
-    Generates a horizontal bar chart displaying the distribution of operating systems based on their frequency in the DataFrame.
+    Generates a horizontal bar chart displaying the distribution of operating systems based on their frequency in the inventory summary.
 
     Args:
-        dataFrame: DataFrame containing OS information.
+        summary: DataFrame returned by summarize_inventory.
         minimumCount: The minimum number of VMs within a certain OS category to display. Default: 500
         maximumCount: The maximum number of VMs within a certain OS category to display. Largely symbolic. Default 99999
 
@@ -240,7 +1140,7 @@ def generate_all_OS_counts(dataFrame, minimumCount=500, maximumCount=99999):
         None
     """
     # Calculate the frequency of each unique OS name
-    counts = dataFrame['OS Name'].value_counts()
+    counts = get_os_name_counts(summary)
     if args.minimum_count:
         minimumCount = args.minimum_count
     # Filter counts within the set thresholds
@@ -262,10 +1162,13 @@ def generate_all_OS_counts(dataFrame, minimumCount=500, maximumCount=99999):
     random_colors = cm.rainbow(np.linspace(0, 1, len(filtered_counts)))
     colors = [os_colors.get(os, random_colors[i]) for i, os in enumerate(filtered_counts.index)]
 
-    # Plot the filtered counts as a horizontal bar chart with specified and random colors
-    filtered_counts.plot(kind='barh', rot=45, color=colors)
     print(filtered_counts)
-    if args.generate_graphs:
+    if args.output_dir:
+        queue_chart(filtered_counts, 'all_os_counts', title='Operating System Distribution', xlabel='Count', ylabel='Operating Systems',
+                    colors=colors, log_scale=True, count_ticks=True)
+    elif args.generate_graphs:
+        # Plot the filtered counts as a horizontal bar chart with specified and random colors
+        filtered_counts.plot(kind='barh', rot=45, color=colors)
 
         # Set titles and labels for the plot
         plt.title('Operating System Distribution')
@@ -279,12 +1182,12 @@ def generate_all_OS_counts(dataFrame, minimumCount=500, maximumCount=99999):
         plt.show(block=True)
         plt.close()
 
-def os_by_version(dataFrame, os_name):
+def os_by_version(summary, os_name):
     """
-    Filters the DataFrame by the specified OS name and plots the distribution of OS versions for the filtered data.
+    Filters the inventory summary by the specified OS name and plots the distribution of OS versions for the filtered data.
 
     Args:
-        dataFrame: DataFrame containing OS information.
+        summary: DataFrame returned by summarize_inventory.
         os_name: Name of the operating system to filter by.
 
     Returns:
@@ -292,12 +1195,13 @@ def os_by_version(dataFrame, os_name):
     """
 
     # Filter rows where the OS name matches the input parameter
-    filtered_df = dataFrame[(dataFrame['OS Name'] == os_name)]
+    filtered_df = summary[(summary['OS Name'] == os_name)]
     # Calculate the frequency of each unique OS version
-    counts = filtered_df['OS Version'].fillna('unknown').value_counts().reset_index()
+    counts = filtered_df.groupby(filtered_df['OS Version'].fillna('unknown'))['Count'].sum()
+    counts = counts.sort_values(ascending=False).reset_index()
     counts.columns = ['OS Version', 'Count']
 
-    format_dataframe_output(counts)
+    format_dataframe_output(counts, os_name)
     
     # We want to print out a text table and not the dataframe
     if args.minimum_count is not None and args.minimum_count > 0:
@@ -305,8 +1209,11 @@ def os_by_version(dataFrame, os_name):
         counts = counts[counts['Count'] >= args.minimum_count]
     # Plot the counts as a horizontal bar chart
     if not counts.empty:
-        ax = counts.plot(kind='barh', rot=45)
-        if args.generate_graphs:
+        if args.output_dir:
+            queue_chart(counts.set_index('OS Version')['Count'], f'os_by_version_{os_name}', title=f'Distribution of {os_name}',
+                        xlabel='Count', ylabel='OS Version')
+        elif args.generate_graphs:
+            ax = counts.plot(kind='barh', rot=45)
             # Set titles and labels for the plot
             plt.title(f'Distribution of {os_name}')
             plt.ylabel('OS Version')
@@ -320,64 +1227,93 @@ def os_by_version(dataFrame, os_name):
             plt.close()
 
 
-def calculate_disk_space_ranges(dataFrame, show_disk_in_tb=False, frameHeading="VM Provisioned (GB)"):
+def get_disk_space_in_gb(dataFrame, frameHeading="VM Provisioned (GB)"):
     """
-    Calculates disk space ranges based on the provisioned disk space of virtual machines in the DataFrame.
+    Returns the disk space column in GB, converting it once if the column is reported in MB.
 
     Args:
         dataFrame: DataFrame containing disk space information for virtual machines.
-        show_disk_in_tb: Boolean flag to determine the disk space ranges (default: False).
+        frameHeading: The column holding the disk space (default: "VM Provisioned (GB)").
 
     Returns:
-        List of disk space ranges with VMs falling within each range.
+        pandas.Series of disk space in GB.
     """
     unit = "MB" if "MiB" in frameHeading or "MB" in frameHeading else "GB" if "GiB" in frameHeading or "GB" in frameHeading else None
+    if unit == "MB":
+        return dataFrame[frameHeading] / 1024
+    return dataFrame[frameHeading]
 
-    # Determine the minimum and maximum disk space provisioned across all VMs
-    min_disk_space = int(dataFrame[frameHeading].min())
-    max_disk_space = int(dataFrame[frameHeading].max())
-    
-    # Define the final range based on the maximum disk space provisioned
-    if max_disk_space > 9000:
-        final_range = (9001, max_disk_space)
-    else:
-        final_range = (10001, 15000)
-    
+
+def get_disk_space_edges(show_disk_in_tb=False, disk_space_edges=None):
+    """
+    Returns the upper bound (in GB) of every disk space range except the last one, which is open ended.
+
+    Args:
+        show_disk_in_tb: Boolean flag to use the terabyte ranges (default: False).
+        disk_space_edges: User defined upper bounds which take precedence over the defaults (default: None).
+
+    Returns:
+        Sorted list of ints.
+    """
+    if disk_space_edges:
+        return sorted(set(disk_space_edges))
     if show_disk_in_tb:
-        disk_space_ranges = [
-        (min_disk_space, 2000),  
-        (2001, 9000), 
-        final_range
-    ]
+        return list(TERABYTE_DISK_SPACE_EDGES)
+    return list(DEFAULT_DISK_SPACE_EDGES)
+
+
+def assign_disk_space_ranges(dataFrame, show_disk_in_tb=False, frameHeading="VM Provisioned (GB)", disk_space_edges=None, disk_space_limits=None):
+    """
+    Assigns every VM to a disk space range with a single pd.cut over the disk space column.
+    The first range starts at the smallest disk in the DataFrame and the last range ends at the largest.
+
+    Args:
+        dataFrame: DataFrame containing disk space information for virtual machines.
+        show_disk_in_tb: Boolean flag to use the terabyte ranges (default: False).
+        frameHeading: The column holding the disk space (default: "VM Provisioned (GB)").
+        disk_space_edges: User defined upper bounds for the ranges (default: None).
+        disk_space_limits: (smallest, largest) disk used to label the first and last range instead of the DataFrame's own (default: None).
+
+    Returns:
+        Tuple of a categorical pandas.Series with a label such as '201-400 GB' for each VM,
+        and the list of (lower, upper) ranges in the same order as the categories.
+    """
+    disk_space = get_disk_space_in_gb(dataFrame, frameHeading=frameHeading)
+    edges = get_disk_space_edges(show_disk_in_tb=show_disk_in_tb, disk_space_edges=disk_space_edges)
+
+    if disk_space_limits:
+        min_disk_space, max_disk_space = disk_space_limits
     else:
-        # Define predefined disk space ranges
-        disk_space_ranges = [
-            (min_disk_space, 200), 
-            (201, 400), 
-            (401, 600), 
-            (601, 900), 
-            (901, 1500), 
-            (1501, 2000), 
-            (2001, 3000), 
-            (3001, 5000),
-            (5001, 9000), 
-            final_range
-        ]
-        
-    # Identify which VMs fall within each defined range
-    disk_space_ranges_with_vms = []
-    for range_start, range_end in disk_space_ranges:
-        if unit == "MB":
-            vms_in_range = dataFrame[(dataFrame[frameHeading] / 1024 >= range_start) & (dataFrame[frameHeading] / 1024 <= range_end)]
-        else:
-            vms_in_range = dataFrame[(dataFrame[frameHeading] >= range_start) & (dataFrame[frameHeading] <= range_end)]
-        if not vms_in_range.empty:
-            disk_space_ranges_with_vms.append((range_start, range_end))
-    
-    return disk_space_ranges_with_vms
+        min_disk_space = int(disk_space.min())
+        max_disk_space = int(math.ceil(disk_space.max()))
+    disk_space_ranges = list(zip([min_disk_space] + [edge + 1 for edge in edges], edges + [max_disk_space]))
+    labels = [f'{lower}-{upper} GB' for lower, upper in disk_space_ranges]
 
+    # Each range includes its upper bound, so 200.5 GB lands in 201-400 rather than falling between the ranges
+    disk_space_buckets = pd.cut(disk_space, bins=[-np.inf] + edges + [np.inf], labels=labels)
+    return disk_space_buckets, disk_space_ranges
 
-def plot_disk_space_distribution(dataFrame, os_name=None, os_version=None, show_disk_in_tb=False, frameHeading="VM Provisioned (GB)"):
+
+def calculate_disk_space_ranges(dataFrame, show_disk_in_tb=False, frameHeading="VM Provisioned (GB)", disk_space_edges=None):
+    """
+    Calculates disk space ranges based on the provisioned disk space of virtual machines in the DataFrame.
+
+    Args:
+        dataFrame: DataFrame containing disk space information for virtual machines.
+        show_disk_in_tb: Boolean flag to determine the disk space ranges (default: False).
+        frameHeading: The column holding the disk space (default: "VM Provisioned (GB)").
+        disk_space_edges: User defined upper bounds for the ranges (default: None).
+
+    Returns:
+        List of disk space ranges with VMs falling within each range.
+    """
+    disk_space_buckets, disk_space_ranges = assign_disk_space_ranges(dataFrame, show_disk_in_tb=show_disk_in_tb,
+                                                                     frameHeading=frameHeading, disk_space_edges=disk_space_edges)
+    range_counts = disk_space_buckets.value_counts(sort=False)
+    return [disk_range for disk_range, count in zip(disk_space_ranges, range_counts) if count]
+
+
+def plot_disk_space_distribution(dataFrame, os_name=None, os_version=None, show_disk_in_tb=False, frameHeading="VM Provisioned (GB)", disk_space_edges=None):
     """
     Plots the distribution of disk space for virtual machines based on specified criteria.
 
@@ -386,32 +1322,19 @@ def plot_disk_space_distribution(dataFrame, os_name=None, os_version=None, show_
         os_name: Name of the operating system (default: None).
         os_version: Version of the operating system (default: None).
         show_disk_in_tb: Boolean flag to filter disk space greater than 2000 GB (default: False).
+        frameHeading: The column holding the disk space (default: "VM Provisioned (GB)").
+        disk_space_edges: User defined upper bounds for the ranges (default: None).
 
     Returns:
         None
     """
 
-    # Create a subplot for plotting
-    fig, ax = plt.subplots()
-    
-    # Calculate disk space ranges and update the DataFrame with the corresponding disk space range for each VM
-    disk_space_ranges = calculate_disk_space_ranges(dataFrame, show_disk_in_tb=show_disk_in_tb, frameHeading=frameHeading)
-    
-    # Filter machines based on disk space condition
-    
-    
-    # Assign disk space ranges to a new column in the DataFrame
-    for lower, upper in disk_space_ranges:
-        mask = (dataFrame['VM Provisioned (GB)'] >= lower) & (dataFrame['VM Provisioned (GB)'] <= upper)
-        dataFrame.loc[mask, 'Disk Space Range'] = f'{lower}-{upper} GB'
-    
-    # Count the number of VMs in each disk space range
-    range_counts = {range_: 0 for range_ in disk_space_ranges}
-    for lower, upper in disk_space_ranges:
-        mask = (dataFrame['VM Provisioned (GB)'] >= lower) & (dataFrame['VM Provisioned (GB)'] <= upper)
-        count = dataFrame.loc[mask].shape[0]
-        range_counts[(lower, upper)] = count
-    
+    # Assign each VM to its disk space range and count the VMs in each range in one pass
+    disk_space_buckets, disk_space_ranges = assign_disk_space_ranges(dataFrame, show_disk_in_tb=show_disk_in_tb,
+                                                                     frameHeading=frameHeading, disk_space_edges=disk_space_edges)
+    dataFrame['Disk Space Range'] = disk_space_buckets.astype(object)
+    range_counts = {disk_range: count for disk_range, count in zip(disk_space_ranges, disk_space_buckets.value_counts(sort=False)) if count}
+
     # Sort the counts and plot them as a horizontal bar chart
     sorted_dict = dict(sorted(range_counts.items(), key=lambda x: x[1]))
     print("Disk Space Range (GB)\t\tCount")
@@ -421,7 +1344,21 @@ def plot_disk_space_distribution(dataFrame, os_name=None, os_version=None, show_
         # for better printing
         disk_range_str =f"{disk_range[0][0]}-{disk_range[0][1]}"
         print(f"{disk_range_str.ljust(32)} {disk_range[1]}")
-    if args.generate_graphs:
+
+    if os_name and os_version:
+        title = f'Hard Drive Space Breakdown for {os_name} {os_version}'
+    elif os_name:
+        title = f'Hard Drive Space Breakdown for {os_name}'
+    else:
+        title = 'Hard Drive Space Breakdown for All Environments'
+
+    if args.output_dir:
+        sorted_counts = pd.Series({f'{range_[0]}-{range_[1]} GB': count for range_, count in sorted_dict.items()})
+        queue_chart(sorted_counts, f'disk_space_{os_name or "all"}_{os_version or "all"}', title=title,
+                    xlabel='Number of Machines', ylabel='Disk Space Range')
+    elif args.generate_graphs:
+        # Create a subplot for plotting
+        fig, ax = plt.subplots()
         for range_, count in sorted_dict.items():
             if os_name:
                 ax.barh(f'{range_[0]}-{range_[1]} GB', count, label=os_name)
@@ -432,13 +1369,7 @@ def plot_disk_space_distribution(dataFrame, os_name=None, os_version=None, show_
         ax.set_ylabel('Disk Space Range')
         ax.set_xlabel('Number of Machines')
         ax.xaxis.set_major_formatter(ticker.ScalarFormatter())
-        
-        if os_name and os_version:
-            ax.set_title(f'Hard Drive Space Breakdown for {os_name} {os_version}')
-        elif os_name:
-            ax.set_title(f'Hard Drive Space Breakdown for {os_name}')
-        else:
-            ax.set_title('Hard Drive Space Breakdown for All Environments')
+        ax.set_title(title)
         ax.set_xlim(right=max(range_counts.values()) + 1.5)
 
         # Display the plot
@@ -465,12 +1396,12 @@ def categorize_environment(x, *args):
             return 'prod'
     return 'non-prod'
 
-def sort_attribute_by_environment(dataFrame, *env_keywords, attribute="operatingSystem", os_filter=None, environment_filter=None, show_disk_in_tb=False):
+def sort_attribute_by_environment(summary, *env_keywords, attribute="operatingSystem", os_filter=None, environment_filter=None):
     """
-    Sorts an attribute by environment in the provided DataFrame based on specified filters.
+    Sorts an attribute by environment in the provided inventory summary based on specified filters.
 
     Args:
-        dataFrame: DataFrame containing the data to be sorted.
+        summary: DataFrame returned by summarize_inventory.
         *env_keywords: Keywords related to environments.
         attribute: Attribute to sort by (default: "operatingSystem").
         os_filter: Filter for specific operating systems (default: None).
@@ -480,14 +1411,12 @@ def sort_attribute_by_environment(dataFrame, *env_keywords, attribute="operating
         None
     """
 
-    data_cp = dataFrame.copy()
-    data_cp['Environment'] = dataFrame['Environment'].apply(categorize_environment, args=env_keywords)
-
+    data_cp = summary
     if os_filter:
         data_cp = data_cp[data_cp['OS Name'] == os_filter]
 
     if environment_filter and environment_filter not in ["all", "both"]:
-        data_cp = data_cp[data_cp['Environment'] == environment_filter]
+        data_cp = data_cp[data_cp['Environment Type'] == environment_filter]
 
     if data_cp.empty:
         print(f"None found in {environment_filter} \n")
@@ -496,14 +1425,14 @@ def sort_attribute_by_environment(dataFrame, *env_keywords, attribute="operating
     if attribute == "operatingSystem":
         handle_operating_system(data_cp, environment_filter)
     elif attribute == "diskSpace":
-        handle_disk_space(data_cp, environment_filter, env_keywords, os_filter, show_disk_in_tb=show_disk_in_tb)
+        handle_disk_space(data_cp, environment_filter, env_keywords, os_filter)
 
 def handle_operating_system(data_cp, environment_filter):
     """
     Handles operating system information based on the provided data and environment filter.
 
     Args:
-        data_cp: DataFrame containing operating system information for virtual machines.
+        data_cp: Inventory summary rows containing operating system information for virtual machines.
         environment_filter: Filter for specific environments.
 
     Returns:
@@ -515,10 +1444,10 @@ def handle_operating_system(data_cp, environment_filter):
         min_count = 100
 
     if not environment_filter or environment_filter == 'all':
-        counts = data_cp['OS Name'].value_counts()
+        counts = get_os_name_counts(data_cp)
         counts = counts[counts >= min_count]
     else:
-        counts = data_cp.groupby(['OS Name', 'Environment']).size().unstack().fillna(0)
+        counts = data_cp.groupby(['OS Name', 'Environment Type'])['Count'].sum().unstack().fillna(0).rename_axis(columns='Environment')
         counts['total'] = counts.sum(axis=1)
         counts['combined_total'] = counts['prod'] + counts['non-prod']
         counts = counts[(counts['total'] >= min_count) & (counts['combined_total'] >= min_count)].drop(['total', 'combined_total'], axis=1)
@@ -540,18 +1469,21 @@ def handle_operating_system(data_cp, environment_filter):
     random_colors = cm.rainbow(np.linspace(0, 1, len(counts)))
     colors = [os_colors.get(os, random_colors[i]) for i, os in enumerate(os_names)]
 
-    ax = counts.plot(kind='barh', rot=45, color=colors)
-    if args.generate_graphs:
+    if args.output_dir:
+        queue_chart(counts, f'os_counts_{environment_filter or "all"}', title=f'OS Counts by Environment Type (>= {min_count})',
+                    xlabel='Count', colors=colors)
+    elif args.generate_graphs:
+        ax = counts.plot(kind='barh', rot=45, color=colors)
         plt.xlabel('Count')
         plt.title(f'OS Counts by Environment Type (>= {min_count})')
         plt.show(block=True)
 
-def handle_disk_space(data_cp, environment_filter, env_keywords, os_filter, show_disk_in_tb=False):
+def handle_disk_space(data_cp, environment_filter, env_keywords, os_filter):
     """
     Handles disk space information based on the provided data, environment filter, and operating system filter.
 
     Args:
-        data_cp: DataFrame containing disk space information for virtual machines.
+        data_cp: Inventory summary rows containing disk space information for virtual machines.
         environment_filter: Filter for specific environments.
         env_keywords: Keywords related to environments.
         os_filter: Filter for specific operating systems.
@@ -560,22 +1492,15 @@ def handle_disk_space(data_cp, environment_filter, env_keywords, os_filter, show
         None
     """
 
-    disk_space_ranges = calculate_disk_space_ranges(data_cp, show_disk_in_tb=show_disk_in_tb)
-    for lower, upper in disk_space_ranges:
-        mask = (data_cp['VM Provisioned (GB)'] >= lower) & (data_cp['VM Provisioned (GB)'] <= upper)
-        data_cp.loc[mask, 'Disk Space Range'] = f'{lower}-{upper} GB'
-
     if environment_filter is None:
         environment_filter = "all"
 
     if environment_filter == "both":
-        range_counts_by_environment = data_cp.groupby(['Disk Space Range', 'Environment']).size().unstack(fill_value=0)
+        range_counts_by_environment = data_cp.groupby(['Disk Space Range', 'Environment Type'])['Count'].sum().unstack(fill_value=0).rename_axis(columns='Environment')
     elif environment_filter == "all":
-        range_counts_by_environment = data_cp['Disk Space Range'].value_counts().reset_index()
-        range_counts_by_environment.columns = ['Disk Space Range', 'Count']
-        range_counts_by_environment.set_index('Disk Space Range', inplace=True)
+        range_counts_by_environment = data_cp.groupby('Disk Space Range')['Count'].sum().to_frame('Count')
     else:
-        range_counts_by_environment = data_cp[data_cp['Environment'] == environment_filter].groupby(['Disk Space Range', 'Environment']).size().unstack(fill_value=0)
+        range_counts_by_environment = data_cp[data_cp['Environment Type'] == environment_filter].groupby(['Disk Space Range', 'Environment Type'])['Count'].sum().unstack(fill_value=0).rename_axis(columns='Environment')
 
     # I want to sort the ranges by the number at the end of the range. I need to split out the number and the unit of measurement
     range_counts_by_environment['second_number'] = range_counts_by_environment.index.str.split('-').str[1].str.split().str[0].astype(int)
@@ -586,8 +1511,12 @@ def handle_disk_space(data_cp, environment_filter, env_keywords, os_filter, show
         print_formatted_disk_space(sorted_range_counts_by_environment, environment_filter, env_keywords, os_filter=os_filter)
     else:
         print_formatted_disk_space(sorted_range_counts_by_environment, environment_filter, env_keywords)    
-    sorted_range_counts_by_environment.plot(kind='bar', stacked=False, figsize=(12, 8), rot=45)
-    if args.generate_graphs:
+    if args.output_dir:
+        queue_chart(sorted_range_counts_by_environment, f'disk_space_by_environment_{os_filter or "all"}_{environment_filter}', kind='bar',
+                    title=f'VM Disk Size Ranges Sorted by Environment {f"for {os_filter}" if os_filter else ""}',
+                    xlabel='Disk Space Range', ylabel='Number of VMs', figsize=(12, 8))
+    elif args.generate_graphs:
+        sorted_range_counts_by_environment.plot(kind='bar', stacked=False, figsize=(12, 8), rot=45)
         plt.xlabel('Disk Space Range')
         plt.ylabel('Number of VMs')
         plt.title(f'VM Disk Size Ranges Sorted by Environment {f"for {os_filter}" if os_filter else ""}')
@@ -637,110 +1566,115 @@ def print_formatted_disk_space(sorted_range_counts_by_environment, environment_f
     print(formatted_df_str)
     print()
 
-def calculate_average_ram(df, environment_type):
+def calculate_average_ram(summary, environment_type):
     """
     Calculates the average RAM used for each OS that matches the specified environment type and prints the results in a formatted column layout.
 
     Args:
-        df (pandas.DataFrame): The DataFrame containing the data.
+        summary (pandas.DataFrame): DataFrame returned by summarize_inventory.
         environment_type (str): The environment type to filter the data.
 
     Returns:
         None
     """
 
-    # Get unique OS values from the DataFrame
-    os_values = df['OS Name'].unique()
-
     # Print column headers for OS and Average RAM
     print("{:<20} {:<10}".format("OS", "Average RAM (GB)"))
     print("-" * 30)
 
-    # Loop through each unique OS value
-    for os in os_values:
-        # Filter hosts based on OS and environment type
-        filtered_hosts = df[(df['OS Name'] == os) & (df['Environment'].str.contains(environment_type))]
-        
+    # Filter hosts based on environment type and add up the RAM for each OS
+    filtered_hosts = summary[summary['Environment'].astype(str).str.contains(environment_type, regex=False)]
+    ram_by_os = filtered_hosts.groupby('OS Name')[['Total RAM (GB)', 'RAM Count']].sum()
+
+    for os, row in ram_by_os.iterrows():
         # Calculate and print average RAM if hosts are found
-        if not filtered_hosts.empty:
-            avg_ram = filtered_hosts['VM MEM (GB)'].mean()
+        if row['RAM Count']:
+            avg_ram = row['Total RAM (GB)'] / row['RAM Count']
             print("{:<20} {:<10.2f}".format(os, avg_ram))
 
 
+def calculate_resource_profiles(dataFrame, *env_keywords, environment_type=''):
+    """
+    Calculates the mean, median and 95th percentile of CPU, RAM, provisioned and used disk for each OS and environment
+    from a single grouping of the inventory. When prod keywords are given the environments are grouped into prod and non-prod.
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description='Process some arguments.')
-    disk_group = parser.add_argument_group('Disk Space Analysis', 'Options related to generating disk ranges by os, environment or both')
-    os_group = parser.add_argument_group('Operating System Analysis', 'Options related to generating OS type break downby OS version, environment or both')
-    generic_group = parser.add_argument_group('Arguments that apply to both OS and Disk')
-    generic_group.add_argument('--sort-by-env', type=str, nargs='?', help='Sort disk by environment. Use "all" to get combine count, "both" to show both non-prod and prod, or specify one.')
-    generic_group.add_argument('--prod-env-labels', type=str, nargs='?', help="The values in your data that represent prod environments. This is used to generate prod and non-prod stats. Passed as CSV i.e. --prod-env-labels 'baker,dte'")
-    generic_group.add_argument('--generate-graphs', action='store_true', help='Choose whether or not to output visual graphs. If this option is not set, a text table will be outputted to the terminal')
-    disk_group.add_argument('--get-disk-space-ranges', action='store_true', help="This flag will get disk space ranges regardless of OS. Can be combine with --prod-env-labels and --sort-by-env to target a specific environment")
-    disk_group.add_argument('--show-disk-space-by-os', action='store_true', help='Show disk space by OS')
-    disk_group.add_argument('--breakdown-by-terabyte', action='store_true', help='Breaks disk space down into 0-2TB, 2-9TB and 9TB+ instead of the default categories')
-    os_group.add_argument('--output-os-by-version', action='store_true', help='Output OS by version')
-    os_group.add_argument('--get-os-counts', action='store_true', help='Generate a report that counts the inventory broken down by OS')
-    os_group.add_argument('--os-name', type=str, help='The name of the Operating System to produce a report about')
-    os_group.add_argument('--minimum-count', type=int, help='Anything below this number will be excluded from the results')
-    os_group.add_argument('--get-supported-os', action="store_true", help="Display a graph of the supported operating systems for OpenShift Virt")
-    os_group.add_argument('--get-unsupported-os', action="store_true", help="Display a graph of the unsupported operating systems for OpenShift Virt")
+    Args:
+        dataFrame: The enriched inventory DataFrame.
+        *env_keywords: Keywords denoting prod environments.
+        environment_type (str): Only include environments containing this value. Empty includes every environment (default: '').
 
-    args = parser.parse_args()
+    Returns:
+        DataFrame with a row per OS and environment, a 'VM Count' column and a '<resource> <statistic>' column for every
+        resource in RESOURCE_COLUMNS and statistic in RESOURCE_STATISTICS.
+    """
+    if environment_type:
+        dataFrame = dataFrame[dataFrame['Environment'].astype(str).str.contains(environment_type, regex=False)]
+    if env_keywords:
+        group_keys = [dataFrame['OS Name'], classify_environments(dataFrame['Environment'], *env_keywords).rename('Environment Type')]
+    else:
+        group_keys = ['OS Name', 'Environment']
 
+    resource_columns = [column for column in RESOURCE_COLUMNS if column in dataFrame.columns]
+    grouped = dataFrame.groupby(group_keys, dropna=False, observed=True)[resource_columns]
+    percentiles = grouped.quantile(0.95)
+    percentiles.columns = pd.MultiIndex.from_product([percentiles.columns, ['p95']])
+    profiles = pd.concat([grouped.agg(['mean', 'median']), percentiles], axis=1)
+    profiles = profiles[pd.MultiIndex.from_product([resource_columns, RESOURCE_STATISTICS])]
+    profiles.columns = [f'{column} {statistic}' for column, statistic in profiles.columns]
+    profiles.insert(0, 'VM Count', grouped.size())
+    return profiles.reset_index()
 
-    def required_if(argument, value):
-        """
-        Decorator that checks if a specific argument is required based on a given value.
 
-        Args:
-            argument: The argument to be checked.
-            value: The value that triggers the requirement for the argument.
+def print_resource_profiles(profiles):
+    """
+    Prints the resource profiles one OS and environment per row.
 
-        Returns:
-            A function that validates the argument value.
-        """
+    Args:
+        profiles: DataFrame returned by calculate_resource_profiles.
 
-        def required(argument_value):
-            if argument_value == value and getattr(args, argument) is None:
-                raise argparse.ArgumentTypeError(f'{argument} is required when using --sort-by-env')
-            return argument_value
-        return required
-    
-    args.sort_by_env = required_if('sort_by_env', '--sort-by-env')(args.sort_by_env)
+    Returns:
+        None
+    """
+    print("")
+    print("Resource profiles")
+    print('--------------')
+    print(profiles.round(2).to_string(index=False))
+    print("")
 
-    # Load the CSV file
-    #file_path = "/home/stratus/Downloads/RVTools_tabvInfo.csv"
-    #file_path = "/home/stratus/Downloads/SC_Datacenter_Output.csv"
-    file_path = '/home/stratus/temp/Inventory_VMs_redhat_06_27_24_edited.csv'
-    file_type = get_file_type(file_path)
-    
-   
-    if args.generate_graphs:
-        # If the user wants to see graphs, set the interactive mode on matplotlib
-        matplotlib.use('TkAgg')
 
-    # assuming someone has provided prod labels, we need to split them
-    environments = []
-    if args.prod_env_labels:
-        environments = args.prod_env_labels.split(',')
-    if args.sort_by_env and not environments:
-        print("\n\nYou specified you wanted to sort by environment but did not provide a definition of what categorizes a Prod environment... exiting\n")
-        exit()
+def save_resource_profiles(profiles, output_path):
+    """
+    Writes the resource profiles as JSON records if output_path ends in .json, otherwise as CSV.
 
-    if "csv" in file_type:
-        df = pd.read_csv(file_path)
-    elif "spreadsheetml" in file_type:
-        df = pd.read_excel(file_path)
+    Args:
+        profiles: DataFrame returned by calculate_resource_profiles.
+        output_path (str): Where to write the profiles.
+
+    Returns:
+        None
+    """
+    if output_path.endswith('.json'):
+        profiles.to_json(output_path, orient='records', indent=2)
     else:
-        print("File passed in was neither a CSV nor an Excel file\nBailing...")
-        exit()
+        profiles.to_csv(output_path, index=False)
 
-    add_extra_columns(df)
-    
-   
+
+
+def generate_reports(summary, df, environments):
+    """
+    Prints (and plots) every report requested on the command line. The reports read their flags from the global args,
+    which the query server swaps out for each query.
+
+    Args:
+        summary: DataFrame returned by summarize_inventory.
+        df: The enriched inventory, or None when it was streamed with --chunksize.
+        environments: Keywords denoting prod environments.
+
+    Returns:
+        None
+    """
     # Call the function for each unique OS name in the 'OS Name' dataframe
-    unique_os_names = df['OS Name'].unique()
+    unique_os_names = summary['OS Name'].unique()
 
     ############## DISK RELATED OPTIONS
     ###
@@ -750,46 +1684,40 @@ if __name__ == "__main__":
             # If the user has defined what values indicuate a prod environment, sort between prod and non-prod
             if environments:
                 if args.sort_by_env:
-                    sort_attribute_by_environment(df, attribute="diskSpace", os_filter=args.os_name, environment_filter=args.sort_by_env, *environments)    
+                    sort_attribute_by_environment(summary, attribute="diskSpace", os_filter=args.os_name, environment_filter=args.sort_by_env, *environments)    
                 else:
-                    sort_attribute_by_environment(df, attribute="diskSpace", os_filter=args.os_name, *environments)
+                    sort_attribute_by_environment(summary, attribute="diskSpace", os_filter=args.os_name, *environments)
             else:
-                sort_attribute_by_environment(df, attribute="diskSpace", os_filter=args.os_name)
+                sort_attribute_by_environment(summary, attribute="diskSpace", os_filter=args.os_name)
         else:
             # If the user has not specified an OS name, assume they want them all
             for os_name in unique_os_names:
                 if environments:           
-                    sort_attribute_by_environment(df, attribute="diskSpace", os_filter=os_name,environment_filter=args.sort_by_env, *environments)
+                    sort_attribute_by_environment(summary, attribute="diskSpace", os_filter=os_name,environment_filter=args.sort_by_env, *environments)
                     matplotlib.pyplot.close()
                 else:
-                    sort_attribute_by_environment(df, attribute="diskSpace", os_filter=os_name)
+                    sort_attribute_by_environment(summary, attribute="diskSpace", os_filter=os_name)
                     matplotlib.pyplot.close()
 
     if args.get_disk_space_ranges or args.show_disk_space_by_os:
         if args.sort_by_env == 'all':
             if args.show_disk_space_by_os:
                 if environments and args.sort_by_env:
-                    sort_attribute_by_environment(df, attribute="diskSpace",environment_filter=args.sort_by_env, *environments )
+                    sort_attribute_by_environment(summary, attribute="diskSpace",environment_filter=args.sort_by_env, *environments )
                 else:
                     print("Missing information regarding how to sort the environment between prod and non-prod")
                     exit()
             else:
-                if args.breakdown_by_terabyte:
-                    sort_attribute_by_environment(df, attribute="diskSpace", environment_filter=args.sort_by_env, show_disk_in_tb=args.breakdown_by_terabyte)
-                else:
-                    sort_attribute_by_environment(df, attribute="diskSpace", environment_filter=args.sort_by_env)
+                sort_attribute_by_environment(summary, attribute="diskSpace", environment_filter=args.sort_by_env)
                 #disk_use_for_environment(df)
         elif args.sort_by_env:
             if args.get_disk_space_ranges and environments:
-                if args.breakdown_by_terabyte:
-                    sort_attribute_by_environment(df, environment_filter=args.sort_by_env,  attribute="diskSpace", show_disk_in_tb=args.breakdown_by_terabyte, *environments)
-                else:
-                    sort_attribute_by_environment(df, environment_filter=args.sort_by_env,  attribute="diskSpace", *environments)
+                sort_attribute_by_environment(summary, environment_filter=args.sort_by_env,  attribute="diskSpace", *environments)
             else:
                 print("Failed to determine prod from non-prod environments... Perhaps you did not pass in the --prod-env-labels ?")
                 exit()
         else:
-            sort_attribute_by_environment(df, attribute="diskSpace", environment_filter="all")
+            sort_attribute_by_environment(summary, attribute="diskSpace", environment_filter="all")
 
     ###
     ############# END DISK SECTION
@@ -800,33 +1728,385 @@ if __name__ == "__main__":
     ###
     if args.output_os_by_version:
         for os_name in unique_os_names:
-            os_by_version(df, os_name)
+            os_by_version(summary, os_name)
 
     if args.get_os_counts:
         if environments:
             if args.os_name:
-                sort_attribute_by_environment(df, attribute="operatingSystem", os_filter=args.os_name, *environments)
+                sort_attribute_by_environment(summary, attribute="operatingSystem", os_filter=args.os_name, *environments)
             elif args.sort_by_env:
-                sort_attribute_by_environment(df, attribute="operatingSystem", *environments, environment_filter=args.sort_by_env)
+                sort_attribute_by_environment(summary, attribute="operatingSystem", *environments, environment_filter=args.sort_by_env)
             else:
-                sort_attribute_by_environment(df, attribute="operatingSystem", *environments)
+                sort_attribute_by_environment(summary, attribute="operatingSystem", *environments)
         else:
             if args.os_name:
-                sort_attribute_by_environment(df, attribute="operatingSystem", os_filter=args.os_name)
+                sort_attribute_by_environment(summary, attribute="operatingSystem", os_filter=args.os_name)
             else:
-                sort_attribute_by_environment(df, attribute="operatingSystem")
+                sort_attribute_by_environment(summary, attribute="operatingSystem")
     
     if args.get_supported_os:
         if args.prod_env_labels and args.sort_by_env:
-            generate_supported_OS_counts(df, *environments, environment_filter=args.sort_by_env)
+            generate_supported_OS_counts(summary, *environments, environment_filter=args.sort_by_env)
         else:
-            generate_supported_OS_counts(df)
+            generate_supported_OS_counts(summary)
     if args.get_unsupported_os:
-        generate_unsupported_OS_counts(df)
+        generate_unsupported_OS_counts(summary)
         
     ###
     ############# END OPERATING SYSTEM SECTION
 
+    if args.get_average_ram is not None:
+        calculate_average_ram(summary, args.get_average_ram)
+
+    if args.resource_profiles is not None and df is not None:
+        resource_profiles = calculate_resource_profiles(df, *environments, environment_type=args.resource_profiles)
+        print_resource_profiles(resource_profiles)
+        if args.resource_profiles_output:
+            save_resource_profiles(resource_profiles, args.resource_profiles_output)
+            print(f"Saved resource profiles to {args.resource_profiles_output}")
+
+
+def build_query_args(query_string):
+    """
+    Turns a query such as 'get-os-counts&minimum-count=5' into the args the reports read. Each key is a command line
+    flag without the leading dashes, and flags which take no value are given without one.
+
+    Args:
+        query_string (str): The query string of the request.
+
+    Returns:
+        argparse.Namespace: The server's arguments with the report flags from the query.
+
+    Raises:
+        ValueError: If the query is not valid for the command line parser or sets a flag which is fixed when the server starts.
+    """
+    query_argv = []
+    for flag, value in urllib.parse.parse_qsl(query_string, keep_blank_values=True):
+        query_argv.append(f'--{flag}={value}' if value else f'--{flag}')
+    parser = build_argument_parser()
+    parser_output = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(parser_output):
+            query_args = parser.parse_args(query_argv)
+    except SystemExit:
+        # Only keep the reason, not the full usage message
+        raise ValueError(parser_output.getvalue().strip().splitlines()[-1])
+    defaults = parser.parse_args([])
+    for flag, value in vars(query_args).items():
+        if flag not in QUERY_FLAGS and value != getattr(defaults, flag):
+            raise ValueError(f"--{flag.replace('_', '-')} can only be set when starting the server")
+
+    server_args = argparse.Namespace(**vars(SERVER_STATE['args']))
+    for flag in QUERY_FLAGS:
+        setattr(server_args, flag, getattr(query_args, flag))
+    return server_args
+
+
+@functools.lru_cache(maxsize=QUERY_CACHE_SIZE)
+def answer_report_query(query_string):
+    """
+    Runs the reports a query asks for and captures what they print, exactly as the command line would show it.
+
+    Args:
+        query_string (str): The query in canonical (sorted) form so that equivalent queries share a cache entry.
+
+    Returns:
+        tuple of (HTTP status, the printed reports).
+    """
+    global args
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        try:
+            query_args = build_query_args(query_string)
+            if query_args.sort_by_env and not SERVER_STATE['environments']:
+                print("sort-by-env needs the server to be started with --prod-env-labels")
+                return 400, output.getvalue()
+            args = query_args
+            generate_reports(SERVER_STATE['summary'], SERVER_STATE['df'], SERVER_STATE['environments'])
+        except ValueError as error:
+            print(error)
+            return 400, output.getvalue()
+        except SystemExit:
+            # Some reports exit after printing why the query could not be answered
+            return 400, output.getvalue()
+        except Exception as error:
+            print(f"The report failed: {type(error).__name__}: {error}")
+            return 500, output.getvalue()
+    return 200, output.getvalue()
+
+
+@functools.lru_cache(maxsize=QUERY_CACHE_SIZE)
+def answer_summary_query(query_string):
+    """
+    Adds up the inventory summary by the columns in group-by (default 'OS Name'), keeping only the rows where each
+    other key in the query, which must be a summary column, has the given value.
+    i.e. 'group-by=OS Version&OS Name=Red Hat Enterprise Linux'
+
+    Args:
+        query_string (str): The query in canonical (sorted) form so that equivalent queries share a cache entry.
+
+    Returns:
+        tuple of (HTTP status, list of dicts with a 'Count', 'Total RAM (GB)' and 'Average RAM (GB)' per group, or an error message).
+    """
+    filters = dict(urllib.parse.parse_qsl(query_string, keep_blank_values=True))
+    group_by = filters.pop('group-by', 'OS Name').split(',')
+    unknown_columns = [column for column in group_by + list(filters) if column not in SUMMARY_COLUMNS]
+    if unknown_columns:
+        return 400, f"Unknown summary columns {unknown_columns}, expected some of {SUMMARY_COLUMNS}"
+
+    summary = SERVER_STATE['summary']
+    for column, value in filters.items():
+        summary = summary[summary[column].astype(str) == value]
+    grouped = summary.groupby(group_by, dropna=False, sort=False)[['Count', 'Total RAM (GB)', 'RAM Count']].sum()
+    grouped['Average RAM (GB)'] = grouped['Total RAM (GB)'] / grouped['RAM Count']
+    grouped = grouped.drop(columns='RAM Count').sort_values('Count', ascending=False).reset_index()
+    return 200, json.loads(grouped.to_json(orient='records'))
+
+
+class ReportRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answers GET /report and /summary queries from the inventory loaded when the server started.
+    """
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        # Sorting the parameters means the same query in a different order is still answered from the cache
+        query_string = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(url.query, keep_blank_values=True)))
+        start = time.perf_counter()
+        try:
+            if url.path == '/report':
+                status, answer = answer_report_query(query_string)
+                key = 'output' if status == 200 else 'error'
+            elif url.path == '/summary':
+                status, answer = answer_summary_query(query_string)
+                key = 'rows' if status == 200 else 'error'
+            else:
+                status, answer, key = 404, "Query /report or /summary", 'error'
+        except Exception as error:
+            # Always answer, an unhandled error would otherwise drop the connection without a response
+            status, answer, key = 500, f"{type(error).__name__}: {error}", 'error'
+        body ={'query': query_string, key: answer, 'elapsed_ms': round((time.perf_counter() - start) * 1000, 3)}
+
+        response = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+
+def serve_reports(summary, df, environments, startup_args, host='127.0.0.1', port=8000):
+    """
+    Keeps the loaded inventory in memory and answers report queries over HTTP until interrupted.
+    Requests are handled one at a time because the reports read the global args and print to stdout.
+
+    Args:
+        summary: DataFrame returned by summarize_inventory.
+        df: The enriched inventory, or None when it was streamed with --chunksize.
+        environments: Keywords denoting prod environments.
+        startup_args: The command line arguments the server was started with.
+        host (str): The address to listen on (default: '127.0.0.1').
+        port (int): The port to listen on (default: 8000).
+
+    Returns:
+        None
+    """
+    # Graphs can not be shown from the server
+    server_args = argparse.Namespace(**vars(startup_args))
+    server_args.generate_graphs = False
+    server_args.output_dir = None
+    SERVER_STATE.update({'summary': summary, 'df': df, 'environments': environments, 'args': server_args})
+    answer_report_query.cache_clear()
+    answer_summary_query.cache_clear()
+
+    server = http.server.HTTPServer((host, port), ReportRequestHandler)
+    print(f"Answering queries on http://{host}:{port}/report?get-os-counts and http://{host}:{port}/summary?group-by=OS+Name. Press Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def build_argument_parser():
+    """
+    Builds the command line parser. The query server also uses it to read report queries, see build_query_args.
+
+    Returns:
+        argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(description='Process some arguments.')
+    disk_group = parser.add_argument_group('Disk Space Analysis', 'Options related to generating disk ranges by os, environment or both')
+    os_group = parser.add_argument_group('Operating System Analysis', 'Options related to generating OS type break downby OS version, environment or both')
+    generic_group = parser.add_argument_group('Arguments that apply to both OS and Disk')
+    generic_group.add_argument('--output-dir', type=str, help='Write every chart to this directory instead of displaying them. Charts are rendered in parallel')
+    generic_group.add_argument('--image-format', type=str, choices=['png', 'svg'], default='png', help='The image format used with --output-dir. Default: png')
+    generic_group.add_argument('--file', type=str, nargs='+', help="One or more CSV or Excel inventories to assess together. Glob patterns are expanded i.e. --file '/data/rvtools/*.xlsx'")
+    generic_group.add_argument('--workers', type=int, help='The number of processes used to parse multiple inventory files and render charts. Defaults to the number of CPUs')
+    generic_group.add_argument('--sort-by-env', type=str, nargs='?', help='Sort disk by environment. Use "all" to get combine count, "both" to show both non-prod and prod, or specify one.')
+    generic_group.add_argument('--prod-env-labels', type=str, nargs='?', help="The values in your data that represent prod environments. This is used to generate prod and non-prod stats. Passed as CSV i.e. --prod-env-labels 'baker,dte'")
+    generic_group.add_argument('--generate-graphs', action='store_true', help='Choose whether or not to output visual graphs. If this option is not set, a text table will be outputted to the terminal')
+    generic_group.add_argument('--get-average-ram', type=str, nargs='?', const='', help='Print the average RAM per OS for environments containing this value. Leave empty to include every environment')
+    generic_group.add_argument('--resource-profiles', type=str, nargs='?', const='', help='Print the mean, median and p95 CPU, RAM and disk per OS and environment for environments containing this value. Leave empty to include every environment')
+    generic_group.add_argument('--resource-profiles-output', type=str, help='Also save the resource profiles to this .csv or .json file')
+    generic_group.add_argument('--os-parsing-rules', type=str, help='A JSON file of vendor specific rules for splitting "VM OS" into OS Name, OS Version and Architecture')
+    generic_group.add_argument('--chunksize', type=int, help='Stream the CSV this many rows at a time to keep memory bounded on very large inventories. Bypasses the cache')
+    generic_group.add_argument('--save-snapshot', action='store_true', help='Record this inventory in the snapshot store so that later runs can be compared against it with --diff')
+    generic_group.add_argument('--diff', action='store_true', help='Report the VMs added, removed, resized or changed OS since the last snapshot and update the reports from the changes only')
+    generic_group.add_argument('--vm-id-column', type=str, default='VM', help="The column which uniquely identifies a VM when using --diff. Default: 'VM'")
+    generic_group.add_argument('--compact', action='store_true', help='Only load the columns the reports need and store them as categoricals and downcast numbers to reduce memory use')
+    generic_group.add_argument('--memory-usage', action='store_true', help='Print the memory used by each column of the loaded inventory')
+    generic_group.add_argument('--serve', type=int, metavar='PORT', help='Load the inventory once and answer report queries over HTTP on this port, i.e. /report?get-os-counts&minimum-count=5')
+    generic_group.add_argument('--host', type=str, default='127.0.0.1', help='The address to listen on with --serve. Default: 127.0.0.1')
+    generic_group.add_argument('--no-cache', action='store_true', help='Do not read or write the on-disk cache of the parsed inventory')
+    generic_group.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR, help=f'Where to store the parsed inventory cache. Default: {DEFAULT_CACHE_DIR}')
+    disk_group.add_argument('--get-disk-space-ranges', action='store_true', help="This flag will get disk space ranges regardless of OS. Can be combine with --prod-env-labels and --sort-by-env to target a specific environment")
+    disk_group.add_argument('--show-disk-space-by-os', action='store_true', help='Show disk space by OS')
+    disk_group.add_argument('--breakdown-by-terabyte', action='store_true', help='Breaks disk space down into 0-2TB, 2-9TB and 9TB+ instead of the default categories')
+    disk_group.add_argument('--disk-space-ranges', type=str, help="Comma separated upper bounds in GB for the disk space ranges i.e. --disk-space-ranges '500,2000,9000'. Overrides --breakdown-by-terabyte")
+    disk_group.add_argument('--disk-space-column', type=str, default='VM Provisioned (GB)', help="The column to build the disk space ranges from. Default: 'VM Provisioned (GB)'. Use 'VM Used (GB)' for consumed disk")
+    os_group.add_argument('--output-os-by-version', action='store_true', help='Output OS by version')
+    os_group.add_argument('--get-os-counts', action='store_true', help='Generate a report that counts the inventory broken down by OS')
+    os_group.add_argument('--os-name', type=str, help='The name of the Operating System to produce a report about')
+    os_group.add_argument('--minimum-count', type=int, help='Anything below this number will be excluded from the results')
+    os_group.add_argument('--get-supported-os', action="store_true", help="Display a graph of the supported operating systems for OpenShift Virt")
+    os_group.add_argument('--get-unsupported-os', action="store_true", help="Display a graph of the unsupported operating systems for OpenShift Virt")
+    return parser
+
+
+if __name__ == "__main__":
+    parser = build_argument_parser()
+    args = parser.parse_args()
+
+
+    def required_if(argument, value):
+        """
+        Decorator that checks if a specific argument is required based on a given value.
+
+        Args:
+            argument: The argument to be checked.
+            value: The value that triggers the requirement for the argument.
+
+        Returns:
+            A function that validates the argument value.
+        """
+
+        def required(argument_value):
+            if argument_value == value and getattr(args, argument) is None:
+                raise argparse.ArgumentTypeError(f'{argument} is required when using --sort-by-env')
+            return argument_value
+        return required
+    
+    args.sort_by_env = required_if('sort_by_env', '--sort-by-env')(args.sort_by_env)
+
+    # Load the CSV file
+    #file_path = "/home/stratus/Downloads/RVTools_tabvInfo.csv"
+    #file_path = "/home/stratus/Downloads/SC_Datacenter_Output.csv"
+    file_path = '/home/stratus/temp/Inventory_VMs_redhat_06_27_24_edited.csv'
+    file_paths = expand_inventory_paths(args.file) if args.file else [file_path]
+    for inventory_path in file_paths:
+        if not os.path.exists(inventory_path):
+            print(f"{inventory_path} does not exist... exiting\n")
+            exit()
+        file_type = get_file_type(inventory_path)
+        if "csv" not in file_type and "spreadsheetml" not in file_type:
+            print(f"{inventory_path} is neither a CSV nor an Excel file\nBailing...")
+            exit()
+
+    if args.generate_graphs and not args.output_dir:
+        # If the user wants to see graphs, set the interactive mode on matplotlib
+        matplotlib.use('TkAgg')
+
+    # assuming someone has provided prod labels, we need to split them
+    environments = []
+    if args.prod_env_labels:
+        environments = args.prod_env_labels.split(',')
+    if args.sort_by_env and not environments:
+        print("\n\nYou specified you wanted to sort by environment but did not provide a definition of what categorizes a Prod environment... exiting\n")
+        exit()
+
+    if args.os_parsing_rules:
+        load_os_parsing_rules(args.os_parsing_rules)
+
+    disk_space_edges = None
+    if args.disk_space_ranges:
+        try:
+            disk_space_edges = [int(edge) for edge in args.disk_space_ranges.split(',')]
+        except ValueError:
+            print("--disk-space-ranges must be a comma separated list of whole numbers... exiting\n")
+            exit()
+
+    if args.chunksize and not all("csv" in get_file_type(inventory_path) for inventory_path in file_paths):
+        print("--chunksize only applies to CSV files, reading the whole file instead")
+        args.chunksize = None
+    if args.chunksize and (args.diff or args.save_snapshot):
+        print("--diff and --save-snapshot need the whole inventory in memory and are ignored with --chunksize")
+    if args.chunksize and (args.compact or args.memory_usage):
+        print("--compact and --memory-usage apply to the whole inventory and are ignored with --chunksize")
+    if args.chunksize and args.resource_profiles is not None:
+        print("--resource-profiles needs the whole inventory in memory and is ignored with --chunksize")
+
+    # Categorize the environments and bucket the disks once, every report below works off of this summary
+    if args.chunksize:
+        df = None
+        summary = stream_inventory_summary(file_paths, *environments, chunksize=args.chunksize, show_disk_in_tb=args.breakdown_by_terabyte,
+                                           frameHeading=args.disk_space_column, disk_space_edges=disk_space_edges)
+    else:
+        inventory_columns = None
+        if args.compact:
+            inventory_columns = INVENTORY_COLUMNS + [args.disk_space_column]
+            if args.diff or args.save_snapshot:
+                inventory_columns.append(args.vm_id_column)
+        df = load_inventories(file_paths, use_cache=not args.no_cache, cache_dir=args.cache_dir, workers=args.workers,
+                              compact=args.compact, columns=inventory_columns)
+        if args.memory_usage:
+            print_memory_usage(df)
+        snapshot_settings = get_snapshot_settings(*environments, show_disk_in_tb=args.breakdown_by_terabyte,
+                                                  frameHeading=args.disk_space_column, disk_space_edges=disk_space_edges)
+        raw_summary = None
+        if args.diff:
+            if args.vm_id_column not in df.columns:
+                print(f"--diff needs a column identifying each VM but '{args.vm_id_column}' was not found. Use --vm-id-column... exiting\n")
+                exit()
+            snapshot = load_latest_snapshot(args.cache_dir)
+            if snapshot is None:
+                print("There is no snapshot to compare against yet. Use --save-snapshot to record one")
+            else:
+                inventory_diff = diff_inventories(snapshot['inventory'], df, id_column=args.vm_id_column,
+                                                  extra_columns=[args.disk_space_column])
+                print_inventory_diff(inventory_diff, snapshot['timestamp'], id_column=args.vm_id_column)
+                # Only the VMs that changed need to be summarized again if the snapshot was built the same way as this run
+                if snapshot['settings'] != snapshot_settings or inventory_diff['duplicates']:
+                    print("The snapshot can not be updated incrementally, summarizing the whole inventory")
+                else:
+                    raw_summary = update_summary(snapshot['summary'], inventory_diff, *environments, show_disk_in_tb=args.breakdown_by_terabyte,
+                                                 frameHeading=args.disk_space_column, disk_space_edges=disk_space_edges)
+
+        if raw_summary is None:
+            raw_summary = summarize_inventory(prepare_report_frame(df, *environments, show_disk_in_tb=args.breakdown_by_terabyte, frameHeading=args.disk_space_column,
+                                                                   disk_space_edges=disk_space_edges, disk_space_limits=DISK_SPACE_PLACEHOLDER_LIMITS))
+        if args.save_snapshot:
+            snapshot_timestamp = save_snapshot(df, raw_summary, snapshot_settings, cache_dir=args.cache_dir)
+            if snapshot_timestamp:
+                print(f"Saved snapshot {snapshot_timestamp}")
+
+        disk_space = get_disk_space_in_gb(df, frameHeading=args.disk_space_column)
+        summary = relabel_disk_space_ranges(raw_summary, disk_space.min(), disk_space.max(), show_disk_in_tb=args.breakdown_by_terabyte,
+                                            disk_space_edges=disk_space_edges)
+
+    if args.serve:
+        serve_reports(summary, df, environments, args, host=args.host, port=args.serve)
+        exit()
+
+    try:
+        generate_reports(summary, df, environments)
+    finally:
+        # Some reports exit() part way through, the charts queued before that are still written
+        if args.output_dir:
+            image_paths = render_queued_charts(args.output_dir, image_format=args.image_format, workers=args.workers)
+            print(f"Wrote {len(image_paths)} charts to {args.output_dir}")
+
     # disk_use_for_environment(df, show_disk_in_tb=True, frameHeading="VM Used (GB)")
 
     # disk_use_for_environment(df, show_disk_in_tb=False, frameHeading="VM Used (GB)")
@@ -8,15 +8,25 @@ import argparse
 import tempfile
 import traceback
 import sys
+from multiprocessing.pool import ThreadPool
 import common, log
 
+# number of openshift object blueprints downloaded at the same time by retrieve_blueprints
+DEFAULT_DOWNLOAD_WORKERS = 8
+
 
 class ArtifactoryApi():
-    def __init__(self):
+    def __init__(self, download_workers=DEFAULT_DOWNLOAD_WORKERS):
         self.local_dir = tempfile.mkdtemp()
         self.dml_host = common.get_dml()
         self.dml_repositories = common.get_dml_repositories()
         self.SOURCE_DML = "https://repository.rnd.amadeus.net"
+        self.download_workers = download_workers
+        # keep-alive connections shared by every blueprint download, sized for the download workers
+        self.http_session = requests.Session()
+        http_adapter = requests.adapters.HTTPAdapter(pool_connections=download_workers, pool_maxsize=download_workers)
+        self.http_session.mount('http://', http_adapter)
+        self.http_session.mount('https://', http_adapter)
 
     def __del__(self):
         '''
@@ -149,25 +159,24 @@ class ArtifactoryApi():
 
             ############################
             # get openshift object blueprints
-            for openshift_object in cmp_blueprint_json['content']:
-                object_name = openshift_object.get('name')
-                base_url = openshift_object['object']
-
-                sub_object_response = self.__get_sub_blueprint(base_url, blueprint_repo)
-                if sub_object_response.status_code != requests.codes.ok:
-                    missing_blueprints.append("Missing openshift object blueprint '%s'" % base_url)
-                    continue
-
-                try:
-                    # escape place holder used for environment blueprint to get a valid json
-                    sub_object = sub_object_response.text
-                    regex = re.compile(r'\${[\w0-9]*}')  # ${VARIABLE}
-                    sub_object_modified = re.sub(regex, "0", sub_object)
-                    sub_object_json = json.loads(sub_object_modified)
-                except ValueError:
-                    invalid_json_blueprints.append("Openshift object blueprint is not a valid json '%s'" % base_url)
+            # downloads run in parallel, files and config values are then written in the order of the component blueprint
+            download_pool = ThreadPool(max(1, min(self.download_workers, len(cmp_blueprint_json['content']))))
+            try:
+                downloads = download_pool.map(lambda openshift_object: self.__download_openshift_object(openshift_object,
+                                                                                                      blueprint_repo),
+                                              cmp_blueprint_json['content'])
+            finally:
+                download_pool.close()
+                download_pool.join()
+
+            for download in downloads:
+                missing_blueprints.extend(download['missing_blueprints'])
+                invalid_json_blueprints.extend(download['invalid_json_blueprints'])
+                if download['sub_object_json'] is None:
                     continue
 
+                object_name = download['object_name']
+                sub_object_json = download['sub_object_json']
                 object_blueprint_path = os.path.join(component_blueprints_path,
                                                      sub_object_json['kind'],
                                                      sub_object_json['metadata']['name'])
@@ -175,7 +184,7 @@ class ArtifactoryApi():
                 if not os.path.exists(object_blueprint_path):
                     os.makedirs(object_blueprint_path)
                 with open(os.path.join(object_blueprint_path, 'object.json'), 'w') as sub_object_file:
-                    sub_object_file.write(sub_object)
+                    sub_object_file.write(download['sub_object'])
 
                 if object_name:
                     # set local path of object at component level
@@ -189,36 +198,10 @@ class ArtifactoryApi():
                     self.set_config_value(cmp_name, cmp_version, 'component', 'object_name',
                                           object_name, sub_object_json['kind'], sub_object_json['metadata']['name'])
 
-                if sub_object_json['kind'] == 'DeploymentConfig':
-                    pod_name = sub_object_json['metadata']['name']
-                    ############################
-                    # get registrator blueprint
-                    registrator_config = None
-                    for container in sub_object_json['spec']['template']['spec']['containers']:
-                        if container['name'] == 'registrator' or container['image'].startswith('acs/registrator'):
-                            for arg in container['args']:
-                                if arg.startswith('--config-'):
-                                    registrator_config_path = arg.split("=")[-1]
-                                    resgitrator_config_response = self.__get_sub_blueprint(registrator_config_path, blueprint_repo)
-                                    if resgitrator_config_response.status_code != requests.codes.ok:
-                                        missing_blueprints.append("Missing registrator config '%s'" % registrator_config_path)
-
-                                    # check blueprint is a valid json
-                                    try:
-                                        registrator_config = resgitrator_config_response.json()
-                                    except ValueError:
-                                        invalid_json_blueprints.append("Invalid json syntax for registrator config '%s'" %
-                                                                       (registrator_config_path))
-                                    break
-                            # we found a registrator container but no config associated
-                            if not registrator_config:
-                                missing_blueprints.append("Missing config file for pod '%s' and container '%s'" % (pod_name, container['name']))
-                            break
-
-                    if registrator_config:
-                        registrator_config_path = os.path.join(object_blueprint_path, 'registrator.json')
-                        with open(registrator_config_path, 'w') as registrator_config_file:
-                            registrator_config_file.write(resgitrator_config_response.text)
+                if download['registrator_config']:
+                    registrator_config_path = os.path.join(object_blueprint_path, 'registrator.json')
+                    with open(registrator_config_path, 'w') as registrator_config_file:
+                        registrator_config_file.write(download['registrator_config_text'])
         except FileAlreadyExistsException:
             pass  # nothing to do, blueprint already retrieved
 
@@ -387,7 +370,7 @@ class ArtifactoryApi():
         blueprint_path = None
         for dml_repo in self.dml_repositories:
             blueprint_path = self.get_acs_blueprint_path(cmp_name, bp_version, dml_repo, bp_type)
-            response = requests.get(blueprint_path)
+            response = self.http_session.get(blueprint_path)
             if response.status_code == requests.codes.ok:
                 blueprint_content = response.text
                 blueprint_repo = dml_repo
@@ -410,21 +393,83 @@ class ArtifactoryApi():
 
         return (blueprints_path, blueprint_repo, blueprint_json)
 
+    def __download_openshift_object(self, openshift_object, blueprint_repo):
+        '''
+            Download an openshift object blueprint listed in a component blueprint and, for a DeploymentConfig,
+            the config of its registrator container. Nothing is written locally, the errors found are returned with
+            the downloaded content so retrieve_blueprints can aggregate them
+        '''
+        download = {'object_name': openshift_object.get('name'),
+                    'sub_object': None,
+                    'sub_object_json': None,
+                    'registrator_config': None,
+                    'registrator_config_text': None,
+                    'missing_blueprints': [],
+                    'invalid_json_blueprints': []}
+        base_url = openshift_object['object']
+
+        sub_object_response = self.__get_sub_blueprint(base_url, blueprint_repo)
+        if sub_object_response.status_code != requests.codes.ok:
+            download['missing_blueprints'].append("Missing openshift object blueprint '%s'" % base_url)
+            return download
+
+        try:
+            # escape place holder used for environment blueprint to get a valid json
+            sub_object = sub_object_response.text
+            regex = re.compile(r'\${[\w0-9]*}')  # ${VARIABLE}
+            sub_object_modified = re.sub(regex, "0", sub_object)
+            sub_object_json = json.loads(sub_object_modified)
+        except ValueError:
+            download['invalid_json_blueprints'].append("Openshift object blueprint is not a valid json '%s'" % base_url)
+            return download
+        download['sub_object'] = sub_object
+        download['sub_object_json'] = sub_object_json
+
+        if sub_object_json['kind'] == 'DeploymentConfig':
+            pod_name = sub_object_json['metadata']['name']
+            ############################
+            # get registrator blueprint
+            registrator_config = None
+            for container in sub_object_json['spec']['template']['spec']['containers']:
+                if container['name'] == 'registrator' or container['image'].startswith('acs/registrator'):
+                    for arg in container['args']:
+                        if arg.startswith('--config-'):
+                            registrator_config_path = arg.split("=")[-1]
+                            resgitrator_config_response = self.__get_sub_blueprint(registrator_config_path, blueprint_repo)
+                            if resgitrator_config_response.status_code != requests.codes.ok:
+                                download['missing_blueprints'].append("Missing registrator config '%s'" % registrator_config_path)
+
+                            # check blueprint is a valid json
+                            try:
+                                registrator_config = resgitrator_config_response.json()
+                                download['registrator_config_text'] = resgitrator_config_response.text
+                            except ValueError:
+                                download['invalid_json_blueprints'].append("Invalid json syntax for registrator config '%s'" %
+                                                                           (registrator_config_path))
+                            break
+                    # we found a registrator container but no config associated
+                    if not registrator_config:
+                        download['missing_blueprints'].append("Missing config file for pod '%s' and container '%s'" % (pod_name, container['name']))
+                    break
+            download['registrator_config'] = registrator_config
+
+        return download
+
     def __get_sub_blueprint(self, base_url, blueprint_repo):
         '''
             download openshift object blueprint from url found in component blueprint
         '''
         blueprint_url = base_url
         if blueprint_url.startswith('http'):
-            blueprint_response = requests.get(blueprint_url)
+            blueprint_response = self.http_session.get(blueprint_url)
         else:
             # build url with dml + base_url from component blueprint
             blueprint_url = urlparse.urljoin(self.dml_host, base_url)
-            blueprint_response = requests.get(blueprint_url)
+            blueprint_response = self.http_session.get(blueprint_url)
             if blueprint_response.status_code == 404:
                 # build url with dml + repo +  base_url from component blueprint
                 blueprint_url = urlparse.urljoin(self.dml_host, blueprint_repo + '/' + base_url)
-                blueprint_response = requests.get(blueprint_url)
+                blueprint_response = self.http_session.get(blueprint_url)
 
         return blueprint_response
 
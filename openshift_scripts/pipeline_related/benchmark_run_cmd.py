@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# Micro-benchmark of SSHSession.run_cmd against the previous polling implementation.
+# Both run the same short command many times over one session and report wall clock and local CPU time per command.
+# Sample usage: benchmark_run_cmd.py --host master01 --proxy gateway --count 500 --command 'oc whoami'
+
+import argparse
+import getpass
+import os
+import select
+import socket
+import time
+import datetime
+import StringIO
+
+import paramiko
+from tools import ssh
+
+
+def legacy_run_cmd(session, cmd, timeout=ssh.DEFAULT_RUN_CMD_TIMEOUT):
+    '''
+        The output loop of run_cmd before it was reworked: select with the full timeout, StringIO buffering,
+        datetime based timeout checks and a fixed 0.1s sleep once the command has exited
+    '''
+    channel = session.ssh_transport.open_session()
+    channel.setblocking(0)
+    paramiko.agent.AgentRequestHandler(channel)
+    channel.set_combine_stderr(True)
+    channel.get_pty()
+    channel.exec_command(cmd)
+
+    start = datetime.datetime.now()
+    start_secs = time.mktime(start.timetuple())
+
+    output = StringIO.StringIO()
+    while True:
+        got_chunk = False
+        readq, _, _ = select.select([channel], [], [], timeout)
+        for c in readq:
+            if c.recv_ready():
+                data = channel.recv(len(c.in_buffer))
+                output.write(data)
+                got_chunk = True
+
+        if not got_chunk and channel.exit_status_ready() and not channel.recv_ready():
+            time.sleep(0.1)
+            channel.shutdown_read()
+            channel.close()
+            break
+
+        now = datetime.datetime.now()
+        now_secs = time.mktime(now.timetuple())
+        if now_secs - start_secs > timeout:
+            raise socket.timeout
+
+    return (channel.recv_exit_status(), output.getvalue())
+
+
+def current_run_cmd(session, cmd, timeout=ssh.DEFAULT_RUN_CMD_TIMEOUT):
+    return session.run_cmd(cmd, exit_if_error=False, debug=None, timeout=timeout)
+
+
+def time_runner(runner, session, cmd, count):
+    '''
+        Runs cmd count times with runner and returns (wall seconds per command, cpu seconds per command, output)
+    '''
+    # warm up the transport so the first channel does not skew the timings
+    output = runner(session, cmd)[1]
+    cpu_start = sum(os.times()[:2])
+    wall_start = time.time()
+    for _ in range(count):
+        runner(session, cmd)
+    wall = time.time() - wall_start
+    cpu = sum(os.times()[:2]) - cpu_start
+    return (wall / count, cpu / count, output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare SSHSession.run_cmd with the previous implementation')
+
+    parser.add_argument('-r', '--host', required=True, help='Hostname or IP of the host to run the command on')
+    parser.add_argument('-p', '--proxy', help='Hostname or IP of the proxy to connect through')
+    parser.add_argument('-u', '--user', default=getpass.getuser(), help='Username used to login on the proxy and host')
+    parser.add_argument('-c', '--command', default='true', help='Command to run. Default: true')
+    parser.add_argument('-n', '--count', type=int, default=200, help='How many times to run the command. Default: 200')
+
+    options = parser.parse_args()
+
+    if options.proxy:
+        session = ssh.get_session(options.proxy, options.user).get_remote_session(options.host)
+    else:
+        session = ssh.get_session(options.host, options.user)
+
+    try:
+        results = []
+        for name, runner in [("legacy", legacy_run_cmd), ("current", current_run_cmd)]:
+            wall, cpu, output = time_runner(runner, session, options.command, options.count)
+            results.append((name, wall, cpu, output))
+            print "%-8s %8.2f ms/command wall %8.3f ms/command cpu" % (name, wall * 1000, cpu * 1000)
+
+        if results[0][3] != results[1][3]:
+            print "WARNING: the two implementations returned different output"
+        print "speedup: %.2fx" % (results[0][1] / results[1][1])
+    finally:
+        ssh.session_pool.close_all()
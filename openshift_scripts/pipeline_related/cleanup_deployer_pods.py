@@ -36,7 +36,7 @@ if __name__ == "__main__":
     user = common.get_stack_user()
     gateway_ip = common.get_gateway_ip()
     env_options = common.get_env_options()
-    gateway_session = ssh.SSHSession(gateway_ip, user)
+    gateway_session = ssh.get_session(gateway_ip, user)
 
     for deployer_pod_line in open(cleanup_file).readlines():
         if "deploy" not in deployer_pod_line.split("-")[-1]:
@@ -7,13 +7,17 @@ import argparse
 import paramiko
 import socket
 import time
-import datetime
-import StringIO
 import select
 import traceback
 import random
 import string
 import tempfile
+import threading
+import atexit
+import Queue
+import collections
+import hashlib
+import pipes
 
 # 1A import
 import log
@@ -22,13 +26,47 @@ import log
 # can be overridden for each command
 DEFAULT_RUN_CMD_TIMEOUT = 90
 
+# maximum number of bytes read from a channel at once
+RECV_CHUNK_SIZE = 32768
+
+# clock used for command timeouts, falls back to time.time on python versions without time.monotonic
+monotonic = getattr(time, 'monotonic', time.time)
+
+# maximum number of commands run at the same time by run_cmds_parallel, kept below the default MaxSessions (10)
+# of sshd, which limits how many channels can be open on one connection
+DEFAULT_MAX_PARALLEL_CMDS = 8
+
+# result of one command run by run_cmds_parallel. return_code is None if the command timed out or could not be run,
+# started is False for the commands fail_fast did not start
+CommandResult = collections.namedtuple('CommandResult', ['cmd', 'return_code', 'output', 'duration', 'started'])
+
+# number of SFTP channels used by SFTPClient.put_dir when uploading in parallel
+DEFAULT_PUT_DIR_PARALLEL = 4
+
+# size of the blocks compared by SSHSession.scp to only send the parts of a file which changed
+DELTA_BLOCK_SIZE = 65536
+# files smaller than this are sent whole when they changed, copying the remote file first would cost more
+DELTA_MIN_SIZE = 1048576
+
+# prints the size and the sha256 of every DELTA_BLOCK_SIZE block of the file given as argument, one per line.
+# Only double quotes are used inside so it survives the quoting of run_cmd when running as another user
+REMOTE_BLOCK_SHA256_CMD = ('python -c \'import hashlib, os, sys; f = open(sys.argv[1], "rb"); '
+                           'print(os.path.getsize(sys.argv[1])); '
+                           '[sys.stdout.write(hashlib.sha256(b).hexdigest() + "\\n") '
+                           'for b in iter(lambda: f.read(%d), b"")]\' %%s 2>/dev/null' % DELTA_BLOCK_SIZE)
+
+# pooled sessions unused for longer than this (in seconds) are dropped from the pool
+DEFAULT_POOL_IDLE_TIMEOUT = 300
+
 class SSHSession:
-    def __init__(self, host, username, proxy_transport=None, retry=False, private_key_file=None):
+    def __init__(self, host, username, proxy_transport=None, retry=False, private_key_file=None, proxy_session=None):
         self.host = host
         self.username = username
+        # session whose transport this one is tunnelled through, if any
+        self.proxy_session = proxy_session
+        self.last_used = time.time()
         self.ssh_client = paramiko.client.SSHClient()
         self.ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        self.ssh_remote_session = None
 
         connected_to_host = False
         while not connected_to_host:
@@ -64,16 +102,27 @@ class SSHSession:
     def __del__(self):
         self.close()
 
+    def touch(self):
+        ''' Marks this session and every proxy it is tunnelled through as used, see SSHSessionPool.evict_idle '''
+        session = self
+        while session:
+            session.last_used = time.time()
+            session = session.proxy_session
+
     def close(self):
-        if self.ssh_remote_session:
-            self.ssh_remote_session.close()
-            self.ssh_remote_session = None
         if self.ssh_client and self.ssh_client.get_transport() and self.ssh_client.get_transport().is_active():
             log.info("Closing connection to '%s'..." % self.host)
             self.ssh_client.close()
 
-    def run_cmd(self, cmd, username=None, exit_if_error=True, debug=False, timeout=DEFAULT_RUN_CMD_TIMEOUT, input_data={}):
+    def run_cmd(self, cmd, username=None, exit_if_error=True, debug=False, timeout=DEFAULT_RUN_CMD_TIMEOUT, input_data={},
+                output_callback=None):
+        '''
+            Runs cmd on the host and returns (return code, output).
+            output_callback, if given, is called with each chunk of output as soon as it is received, which allows
+            long outputs to be processed while the command is still running.
+        '''
         try:
+            self.touch()
             user = self.username
             my_cmd = cmd
             if username:
@@ -99,52 +148,51 @@ class SSHSession:
             channel.get_pty()
             channel.exec_command(my_cmd)
 
-            # prepare timer for timeout
-            start = datetime.datetime.now()
-            start_secs = time.mktime(start.timetuple())
+            # the whole command must complete before this deadline
+            deadline = monotonic() + timeout
 
-            output = StringIO.StringIO()
+            chunks = []
             while True:
-                got_chunk = False
-                readq, _, _ = select.select([channel], [], [], timeout)
-                for c in readq:
-                    if c.recv_ready():
-                        data = channel.recv(len(c.in_buffer))
-                        output.write(data)
-                        got_chunk = True
-
-                        if debug and len(data.strip()) > 0:
-                            print data
-
-                        if channel.send_ready():
-                            # We received a potential prompt.
-                            for pattern in input_data.keys():
-                                # pattern text matching => send input data
-                                if pattern in data:
-                                    channel.send(input_data[pattern] + '\n')
-
-                # remote process has exited and returned an exit status
-                if not got_chunk and channel.exit_status_ready() and not channel.recv_ready():
-                    time.sleep(0.1)  # add small timer to let enough time to get all data from the buffer
-                    channel.shutdown_read()  # indicate that we're not going to read from this channel anymore
-                    channel.close()
-                    break  # exit as remote side is finished and our buffers are empty
-
-                # Timeout check
-                now = datetime.datetime.now()
-                now_secs = time.mktime(now.timetuple())
-                et_secs = now_secs - start_secs
-                if et_secs > timeout:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
                     raise socket.timeout
+                # the channel becomes readable when data arrives and when the remote side sends EOF
+                select.select([channel], [], [], remaining)
+
+                if channel.recv_ready():
+                    data = channel.recv(RECV_CHUNK_SIZE)
+                    chunks.append(data)
+
+                    if output_callback:
+                        output_callback(data)
+
+                    if debug and len(data.strip()) > 0:
+                        print data
+
+                    if channel.send_ready():
+                        # We received a potential prompt.
+                        for pattern in input_data.keys():
+                            # pattern text matching => send input data
+                            if pattern in data:
+                                channel.send(input_data[pattern] + '\n')
+
+                # EOF is only received after all the output, so once it is there and the buffer is empty we are done
+                elif channel.eof_received or channel.closed:
+                    channel.shutdown_read()  # indicate that we're not going to read from this channel anymore
+                    break
+
+            output = ''.join(chunks)
 
             if debug:
-                log.debug(output.getvalue())
+                log.debug(output)
 
             return_code = channel.recv_exit_status()
+            channel.close()
 
             if exit_if_error and return_code != 0:
-                log.error("Error launching command '%s' => return code %d, output :\n%s" % (cmd, return_code, output.getvalue()))
-            return (return_code, output.getvalue())
+                log.error("Error launching command '%s' => return code %d, output :\n%s" % (cmd, return_code, output))
+            self.touch()
+            return (return_code, output)
         except socket.timeout:
             channel.close()
             log.error("Timeout of %ds reached when calling command '%s'. Increase timeout if you think the command was still running successfully." % (timeout, cmd))
@@ -160,34 +208,81 @@ class SSHSession:
         (status, output) = self.run_cmd(cmd, username, False, debug, timeout=timeout)
         return status
 
-    def run_cmds(self, cmds, username=None, exit_if_error=True, debug=False, timeout=DEFAULT_RUN_CMD_TIMEOUT, input_data={}):
-        return self.run_cmd(" && ".join(cmds), username, exit_if_error, debug, timeout, input_data)
+    def run_cmds(self, cmds, username=None, exit_if_error=True, debug=False, timeout=DEFAULT_RUN_CMD_TIMEOUT, input_data={},
+                 output_callback=None):
+        return self.run_cmd(" && ".join(cmds), username, exit_if_error, debug, timeout, input_data, output_callback)
+
+    def run_cmds_parallel(self, cmds, username=None, exit_if_error=True, timeout=DEFAULT_RUN_CMD_TIMEOUT,
+                          max_parallel=DEFAULT_MAX_PARALLEL_CMDS, fail_fast=False):
+        '''
+            Runs independent commands at the same time, each on its own channel of this session, with at most
+            max_parallel running at once. Returns a CommandResult per command in the order of cmds.
+            With fail_fast no new command is started once one has failed, the commands which were never started get
+            a result with started=False. Otherwise every command is run.
+            If exit_if_error is set, the failed commands are reported together once all commands have finished
+        '''
+        cmd_queue = Queue.Queue()
+        for index, cmd in enumerate(cmds):
+            cmd_queue.put((index, cmd))
+        results = {}
+        failed = threading.Event()
+
+        def worker():
+            while not (fail_fast and failed.is_set()):
+                try:
+                    index, cmd = cmd_queue.get_nowait()
+                except Queue.Empty:
+                    return
+                start = monotonic()
+                try:
+                    (return_code, output) = self.run_cmd(cmd, username, exit_if_error=False, debug=None, timeout=timeout)
+                except SystemExit:
+                    # run_cmd logs timeouts and socket errors through log.error, which exits the worker thread
+                    (return_code, output) = (None, '')
+                except Exception:
+                    # e.g. the channel was refused because the session already has MaxSessions channels open
+                    (return_code, output) = (None, traceback.format_exc())
+                results[index] = CommandResult(cmd, return_code, output, monotonic() - start, True)
+                if return_code != 0:
+                    failed.set()
+
+        workers = [threading.Thread(target=worker) for _ in range(max(1, min(max_parallel, len(cmds))))]
+        for worker_thread in workers:
+            worker_thread.daemon = True
+            worker_thread.start()
+        for worker_thread in workers:
+            worker_thread.join()
+
+        results = [results.get(index, CommandResult(cmd, None, '', None, False)) for index, cmd in enumerate(cmds)]
+        failures = [result for result in results if result.started and result.return_code != 0]
+        if exit_if_error and failures:
+            log.error("Error launching %d of %d commands on '%s' (%d not started) :\n%s" %
+                      (len(failures), len(cmds), self.host, len([result for result in results if not result.started]),
+                       "\n".join("'%s' => return code %s, output :\n%s" % (result.cmd, result.return_code, result.output)
+                                 for result in failures)))
+        return results
 
     def get_remote_session(self, remote_host, username=None, retry=False):
+        '''
+            Returns a session to remote_host tunnelled through this one.
+            Sessions come from the process-wide pool, so asking again for the same host and user reuses the
+            live connection, and sessions to several remote hosts can be open at the same time.
+        '''
         # get user to be used for remote ssh session
         user = self.username
         if username:
             user = username
 
-        if self.ssh_remote_session:
-            # if requested session already active, return it
-            if self.ssh_transport.is_active() and self.ssh_remote_session.host == remote_host and self.ssh_remote_session.username == user:
-                return self.ssh_remote_session
-            # close previous existing sessions as only 1 tunnel possible on port 22
-            else:
-                self.ssh_remote_session.close()
-                self.ssh_remote_session = None
-
-        log.info("Connecting to '%s' through '%s' with user '%s'..." % (remote_host, self.host, user))
-        self.ssh_remote_session = SSHSession(remote_host, user, self.ssh_transport, retry=retry)
-        return self.ssh_remote_session
+        return session_pool.get_session(remote_host, user, proxy_session=self, retry=retry)
 
     def get_sftp_client(self):
         '''
         See documentation for available methods on paramiko.sftp_client at :
             http://docs.paramiko.org/en/1.16/api/sftp.html
+        Returns this module's SFTPClient, which adds put_dir and mkdir(ignore_existing=True)
         '''
-        return paramiko.sftp_client.SFTPClient.from_transport(self.ssh_transport)
+        self.touch()
+        return SFTPClient.from_transport(self.ssh_transport)
 
 
     def exists(self, path, use_root_access=False):
@@ -208,10 +303,24 @@ class SSHSession:
                 return True
 
 
-    def scp(self, local_path, remote_path, username=None, permissions=None):
+    def get_remote_block_sha256s(self, remote_path, username=None):
+        '''
+            Returns (size, sha256 of every DELTA_BLOCK_SIZE block) of a remote file, or (None, None) if it cannot
+            be read
+        '''
+        (status, output) = self.run_cmd(REMOTE_BLOCK_SHA256_CMD % pipes.quote(remote_path), username=username,
+                                        exit_if_error=False, debug=None)
+        lines = [line.strip() for line in output.splitlines() if line.strip()]
+        if status != 0 or not lines or not lines[0].isdigit():
+            return (None, None)
+        return (int(lines[0]), lines[1:])
+
+    def scp(self, local_path, remote_path, username=None, permissions=None, delta=True):
         '''
             Method to copy local file on a remote host
             Overriding user allows to copy file in location with restricted permissions
+            With delta, nothing is sent when the remote file already has the same content, and for large files only
+            the DELTA_BLOCK_SIZE blocks which differ are sent
         '''
         user = self.username
         if username:
@@ -219,19 +328,61 @@ class SSHSession:
         log.debug("Copy local file '%s' on remote host '%s' in '%s' as '%s'" % (local_path, self.host, remote_path, user))
 
         if not os.path.isfile(local_path):
-            log.error("Local file '%s' does not exist")
+            log.error("Local file '%s' does not exist" % local_path)
 
-        sftp_client = self.get_sftp_client()
+        local_size = os.path.getsize(local_path)
+        remote_size, remote_blocks = (None, None)
+        if delta:
+            local_blocks = local_block_sha256s(local_path)
+            remote_size, remote_blocks = self.get_remote_block_sha256s(remote_path, user)
 
-        # copy local file on remote host in a temp file
-        tmp_remote_path = "/tmp/%s" % ''.join(random.choice(string.ascii_lowercase + string.digits) for _ in range(15))
-        with open(local_path) as local_file, sftp_client.file(tmp_remote_path, mode='w+') as remote_file:
-            remote_file.write(local_file.read())
-
-        # mv this file in the final destination, with the requested user
-        self.run_cmd("mv %s %s" % (tmp_remote_path, remote_path),
-                     username=user,
-                     debug=None)
+        if remote_size == local_size and remote_blocks == local_blocks:
+            log.debug("Remote file '%s' on '%s' is already up to date" % (remote_path, self.host))
+        else:
+            sftp_client = self.get_sftp_client()
+            tmp_remote_path = "/tmp/%s" % ''.join(random.choice(string.ascii_lowercase + string.digits) for _ in range(15))
+
+            copied_remote_file = False
+            if remote_size is not None and local_size >= DELTA_MIN_SIZE:
+                # start from a copy of the remote file owned by the ssh user and only rewrite the blocks which differ
+                copy_cmd = "cp %s %s" % (pipes.quote(remote_path), pipes.quote(tmp_remote_path))
+                copied_remote_file = self.run_cmd(copy_cmd, username=user, exit_if_error=False, debug=None)[0] == 0
+                if copied_remote_file and username:
+                    copied_remote_file = self.run_cmd("sudo chown %s %s" % (self.username, pipes.quote(tmp_remote_path)),
+                                                      exit_if_error=False, debug=None)[0] == 0
+                # cp keeps the mode of the remote file, which may be read-only
+                if copied_remote_file:
+                    copied_remote_file = self.run_cmd("chmod u+w %s" % pipes.quote(tmp_remote_path),
+                                                      exit_if_error=False, debug=None)[0] == 0
+                if not copied_remote_file:
+                    log.debug("Unable to copy remote file '%s' on '%s', sending it whole" % (remote_path, self.host))
+
+            if copied_remote_file:
+                changed_blocks = [index for index, block in enumerate(local_blocks)
+                                  if index >= len(remote_blocks) or remote_blocks[index] != block]
+                log.debug("Sending %d of %d blocks of '%s'" % (len(changed_blocks), len(local_blocks), local_path))
+                try:
+                    with open(local_path, 'rb') as local_file, sftp_client.file(tmp_remote_path, mode='r+') as remote_file:
+                        remote_file.set_pipelined(True)
+                        for index in changed_blocks:
+                            local_file.seek(index * DELTA_BLOCK_SIZE)
+                            remote_file.seek(index * DELTA_BLOCK_SIZE)
+                            remote_file.write(local_file.read(DELTA_BLOCK_SIZE))
+                        remote_file.truncate(local_size)
+                except IOError:
+                    log.debug("Unable to update the copy of '%s' on '%s', sending it whole" % (remote_path, self.host))
+                    try:
+                        sftp_client.remove(tmp_remote_path)
+                    except IOError:
+                        pass
+                    copied_remote_file = False
+
+            if not copied_remote_file:
+                # copy local file on remote host in a temp file
+                with open(local_path) as local_file, sftp_client.file(tmp_remote_path, mode='w+') as remote_file:
+                    remote_file.write(local_file.read())
+
+            self.move_into_place(tmp_remote_path, remote_path, user)
 
         # file will be owned by the specified user
         if username:
@@ -240,30 +391,232 @@ class SSHSession:
         if permissions:
             self.run_cmd("sudo chmod %s %s" % (permissions, remote_path), debug=None)
 
-    def file(self, remote_path, content, username=None, permissions=None):
+    def move_into_place(self, tmp_remote_path, remote_path, user):
+        # mv this file in the final destination, with the requested user
+        self.run_cmd("mv %s %s" % (tmp_remote_path, remote_path),
+                     username=user,
+                     debug=None)
+
+    def file(self, remote_path, content, username=None, permissions=None, delta=True):
         '''
             Method to create a remote file
             Overriding user allows to create file in a location with restricted permissions
+            See scp for delta
         '''
         with tempfile.NamedTemporaryFile() as tmp_local_file:
             tmp_local_file.write(content)
             tmp_local_file.seek(0)
-            self.scp(tmp_local_file.name, remote_path, username, permissions)
+            self.scp(tmp_local_file.name, remote_path, username, permissions, delta)
+
+
+class SSHSessionPool:
+    '''
+        Process-wide cache of live SSH sessions keyed by (host, user, proxy).
+        Every command run on a session opens its own channel, so one pooled session can run several commands at the
+        same time. Sessions idle for longer than idle_timeout are dropped from the pool the next time it is used.
+    '''
+    def __init__(self, idle_timeout=DEFAULT_POOL_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_key(host, username, proxy_session=None):
+        proxy_key = None
+        if proxy_session:
+            proxy_key = SSHSessionPool.get_key(proxy_session.host, proxy_session.username, proxy_session.proxy_session)
+        return (host, username, proxy_key)
+
+    def get_session(self, host, username, proxy_session=None, retry=False, private_key_file=None):
+        '''
+            Returns the pooled session to host, opening it (through proxy_session if given) when there is none or
+            the pooled one is no longer active
+        '''
+        key = self.get_key(host, username, proxy_session)
+        with self.lock:
+            self.evict_idle()
+            session = self.sessions.get(key)
+            if session and session.ssh_transport.is_active():
+                session.touch()
+                return session
+
+        # connect without holding the lock, with retry the connection can take indefinitely
+        if proxy_session:
+            log.info("Connecting to '%s' through '%s' with user '%s'..." % (host, proxy_session.host, username))
+            session = SSHSession(host, username, proxy_session.ssh_transport, retry=retry,
+                                 private_key_file=private_key_file, proxy_session=proxy_session)
+        else:
+            session = SSHSession(host, username, retry=retry, private_key_file=private_key_file)
+
+        with self.lock:
+            pooled_session = self.sessions.get(key)
+            if pooled_session and pooled_session.ssh_transport.is_active():
+                # another thread connected to the same host in the meantime, keep a single session
+                session.close()
+                session = pooled_session
+            else:
+                self.sessions[key] = session
+            session.touch()
+            return session
+
+    def evict_idle(self):
+        '''
+            Forgets the sessions which are closed or have not been used for idle_timeout seconds.
+            Idle sessions are not closed here as a caller may still hold them, they are closed by SSHSession.__del__
+            once nothing references them anymore. A session keeps its proxies referenced, so tunnels stay up while
+            any session going through them is in use. The next get_session for the same host opens a new session
+        '''
+        now = time.time()
+        for key, session in list(self.sessions.items()):
+            if not session.ssh_transport.is_active() or now - session.last_used > self.idle_timeout:
+                del self.sessions[key]
+
+    def close_all(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+
+
+session_pool = SSHSessionPool()
+atexit.register(session_pool.close_all)
+
+
+def get_session(host, username, proxy_session=None, retry=False, private_key_file=None):
+    '''
+        Returns a pooled session to host, see SSHSessionPool.get_session
+    '''
+    return session_pool.get_session(host, username, proxy_session, retry, private_key_file)
+
+
+def local_block_sha256s(path, block_size=DELTA_BLOCK_SIZE):
+    ''' Returns the sha256 hex digest of every block_size block of a local file '''
+    with open(path, 'rb') as local_file:
+        return [hashlib.sha256(block).hexdigest() for block in iter(lambda: local_file.read(block_size), '')]
+
+
+def local_sha256(path):
+    ''' Returns the sha256 hex digest of a local file '''
+    sha = hashlib.sha256()
+    with open(path, 'rb') as local_file:
+        for block in iter(lambda: local_file.read(1024 * 1024), ''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def remote_sha256sums(transport, paths, timeout=DEFAULT_RUN_CMD_TIMEOUT):
+    '''
+        Returns a dictionary of path: sha256 hex digest for the remote files in paths, computed on the remote host with
+        sha256sum command per 500 files. Files which cannot be read are left out
+    '''
+    checksums = {}
+    output = ''
+    for batch_start in range(0, len(paths), 500):
+        channel = transport.open_session()
+        channel.settimeout(timeout)
+        channel.exec_command("sha256sum -- %s 2>/dev/null" %
+                             " ".join(pipes.quote(path) for path in paths[batch_start:batch_start + 500]))
+        output += channel.makefile('r').read()
+        channel.close()
+    for line in output.splitlines():
+        if line.strip():
+            checksum, path = line.split(None, 1)
+            # sha256sum prefixes the path with '*' for binary files
+            checksums[path.lstrip('*')] = checksum
+    return checksums
 
 
 class SFTPClient(paramiko.SFTPClient):
 
-    def put_dir(self, source, target):
+    def put_dir(self, source, target, parallel=DEFAULT_PUT_DIR_PARALLEL, skip_unchanged=False):
         ''' Uploads the contents of the source directory to the target path. The
             target directory needs to exists. All subdirectories in source are
             created under target.
+            parallel is the number of SFTP channels the files are uploaded over at the same time.
+            With skip_unchanged, files whose remote copy has the same size and sha256 are not uploaded again.
+            Returns (number of files uploaded, number of files skipped, bytes uploaded)
         '''
+        start = monotonic()
+        files = self.list_files_to_upload(source, target)
+        skipped = 0
+        if skip_unchanged:
+            changed_files = self.filter_unchanged(files)
+            skipped = len(files) - len(changed_files)
+            files = changed_files
+
+        file_queue = Queue.Queue()
+        for local_path, remote_path, size in files:
+            file_queue.put((local_path, remote_path, size))
+        uploaded = []
+        errors = []
+        transport = self.get_channel().get_transport()
+
+        def worker(sftp_client):
+            try:
+                while not errors:
+                    try:
+                        local_path, remote_path, size = file_queue.get_nowait()
+                    except Queue.Empty:
+                        return
+                    # put pipelines its writes, so each file costs a round trip rather than one per block
+                    sftp_client.put(local_path, remote_path)
+                    uploaded.append(size)
+                    log.debug("Uploaded '%s' (%d/%d)" % (remote_path, len(uploaded), len(files)))
+            except Exception as error:
+                errors.append(error)
+            finally:
+                if sftp_client is not self:
+                    sftp_client.close()
+
+        workers = []
+        for count in range(max(1, min(parallel, len(files)))):
+            # the first worker reuses this client, the others get their own channel on the same transport
+            sftp_client = self if count == 0 else SFTPClient.from_transport(transport)
+            workers.append(threading.Thread(target=worker, args=(sftp_client,)))
+        for worker_thread in workers:
+            worker_thread.start()
+        for worker_thread in workers:
+            worker_thread.join()
+        if errors:
+            raise errors[0]
+
+        elapsed = monotonic() - start
+        uploaded_bytes = sum(uploaded)
+        log.info("Uploaded %d files (%.1f MB) to '%s' in %.1fs (%.1f MB/s), %d unchanged files skipped" %
+                 (len(uploaded), uploaded_bytes / 1048576.0, target, elapsed,
+                  uploaded_bytes / 1048576.0 / max(elapsed, 0.001), skipped))
+        return (len(uploaded), skipped, uploaded_bytes)
+
+    def list_files_to_upload(self, source, target):
+        ''' Creates the subdirectories of source under target and returns (local path, remote path, size) of every
+            file to upload
+        '''
+        files = []
         for item in os.listdir(source):
             if os.path.isfile(os.path.join(source, item)):
-                self.put(os.path.join(source, item), '%s/%s' % (target, item))
+                files.append((os.path.join(source, item), '%s/%s' % (target, item),
+                              os.path.getsize(os.path.join(source, item))))
             else:
                 self.mkdir('%s/%s' % (target, item), ignore_existing=True)
-                self.put_dir(os.path.join(source, item), '%s/%s' % (target, item))
+                files.extend(self.list_files_to_upload(os.path.join(source, item), '%s/%s' % (target, item)))
+        return files
+
+    def filter_unchanged(self, files):
+        ''' Returns the files whose remote copy is missing or differs in size or sha256 '''
+        remote_sizes = {}
+        for remote_dir in set(os.path.dirname(remote_path) for _, remote_path, _ in files):
+            try:
+                for attributes in self.listdir_attr(remote_dir):
+                    remote_sizes['%s/%s' % (remote_dir, attributes.filename)] = attributes.st_size
+            except IOError:
+                pass
+        same_size = [(local_path, remote_path) for local_path, remote_path, size in files
+                     if remote_sizes.get(remote_path) == size]
+        remote_checksums = remote_sha256sums(self.get_channel().get_transport(),
+                                             [remote_path for _, remote_path in same_size])
+        unchanged = set(remote_path for local_path, remote_path in same_size
+                        if remote_checksums.get(remote_path) == local_sha256(local_path))
+        return [file_to_upload for file_to_upload in files if file_to_upload[1] not in unchanged]
 
     def mkdir(self, path, mode=511, ignore_existing=False):
         ''' Augments mkdir by adding an option to not fail if the folder exists  '''
@@ -283,19 +636,25 @@ if __name__ == "__main__":
         parser.add_argument('-c', '--command', action='append', required=True, help='Command to execute on the remote host')
         parser.add_argument('-u', '--user', default=getpass.getuser(), help='Username used to login on both proxy and remote host')
         parser.add_argument('-s', '--command-user', help='Username used to run the command on the remote host')
+        parser.add_argument('--parallel', action='store_true', help='Run the commands at the same time')
 
         options = parser.parse_args()
 
         options.command_user = options.command_user if options.command_user else options.user
 
-        proxy_session = SSHSession(options.proxy, options.user)
+        proxy_session = get_session(options.proxy, options.user)
 
         ssh_remote_session = proxy_session.get_remote_session(options.remote)
         try:
-            for cmd in options.command:
-                (status, output) = ssh_remote_session.run_cmd(cmd, options.command_user)
-                print "exit status: %s" % status
-                print output
+            if options.parallel:
+                for result in ssh_remote_session.run_cmds_parallel(options.command, options.command_user, exit_if_error=False):
+                    print "%s => exit status: %s (%.2fs)" % (result.cmd, result.return_code, result.duration)
+                    print result.output
+            else:
+                for cmd in options.command:
+                    (status, output) = ssh_remote_session.run_cmd(cmd, options.command_user)
+                    print "exit status: %s" % status
+                    print output
         finally:
-            proxy_session.close()
+            session_pool.close_all()
 
@@ -183,7 +183,7 @@ if __name__ == "__main__":
     user = common.get_stack_user()
     gateway_ip = common.get_gateway_ip()
     env_options = common.get_env_options()
-    gateway_session = ssh.SSHSession(gateway_ip, user)
+    gateway_session = ssh.get_session(gateway_ip, user)
     admin01_session = gateway_session.get_remote_session('admin01')
     error_encountered = []
     if options.diff_file:
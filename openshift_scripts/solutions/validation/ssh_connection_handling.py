@@ -10,8 +10,10 @@ class HandleSSHConnections:
     ImportHelper.import_error_handling("paramiko", globals())
     ImportHelper.import_error_handling("time", globals())
 
-    def __init__(self):
+    def __init__(self, command_timeout=None):
         self.ssh = paramiko.SSHClient()
+        # Seconds a remote command may go without producing output before socket.timeout is raised. None waits forever
+        self.command_timeout = command_timeout
 
     def open_ssh(self, server, user_name):
         if not self.ssh_is_connected():
@@ -36,6 +38,15 @@ class HandleSSHConnections:
 
     @staticmethod
     def run_remote_commands(ssh_object, command):
-        stdin, stdout, stderr = ssh_object.ssh.exec_command(command)
+        stdin, stdout, stderr = ssh_object.ssh.exec_command(command, timeout=ssh_object.command_timeout)
         temp_list = stdout.readlines()
-        return(temp_list)
\ No newline at end of file
+        return(temp_list)
+
+    @staticmethod
+    def run_remote_script(ssh_object, script, interpreter="/usr/bin/python -"):
+        # The script is fed to the interpreter on stdin so it does not have to be quoted for the remote shell
+        stdin, stdout, stderr = ssh_object.ssh.exec_command(interpreter, timeout=ssh_object.command_timeout)
+        stdin.write(script)
+        stdin.flush()
+        stdin.channel.shutdown_write()
+        return(stdout.read())
\ No newline at end of file
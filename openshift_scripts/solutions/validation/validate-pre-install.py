@@ -6,9 +6,17 @@
 # Dependencies: helper_functions.py, ssh_connection_handling.py
 # This script has some tight coupling to helper_functions DictionaryHandling particularly when it
 # comes to adding objects to dictionaries.
+# Hosts are validated in parallel by a pool of --workers threads. Each host gets its own ssh connection and
+# records its results under its own key in the summary dictionaries, so the threads do not share any state.
+# The DNS lookups of every host are done beforehand in their own pool of --dns-workers threads.
 
 
+import json
+import os
+import Queue
 import socket
+import threading
+import time
 from helper_functions import DictionaryHandling
 from helper_functions import ImportHelper
 from helper_functions import textColors
@@ -33,6 +41,34 @@ parser.add_option('--openshift-version', dest='openshift_version', help='The ver
 parser.add_option('--private-registry', dest='private_registry', action='store_true', help='Indicates whether or not you are '
                                                                                   'using a private registry for '
                                                                                   'installation')
+parser.add_option('--probe', dest='probe', action='store_true', help='Gather everything from a host with a single '
+                                                                       'remote script instead of running each '
+                                                                       'command separately')
+parser.add_option('--package-cache', dest='package_cache', help='Directory in which to cache the yum output of each '
+                                                                 'host between runs. The cache is reused until the '
+                                                                 'host\'s rpm database changes')
+parser.add_option('--package-cache-max-age', dest='package_cache_max_age', type='int', default=86400,
+                  help='Re-run \'yum list updates\' once its cached output is older than this many seconds even if '
+                       'the rpm database has not changed. Default: 86400')
+parser.add_option('--results-file', dest='results_file', help='Append the result of every check to this file as JSON '
+                                                               'lines, one per host and check')
+parser.add_option('--recheck', dest='recheck', action='store_true', help='Only validate the hosts which failed a check '
+                                                                         'or have no recent results in --results-file. '
+                                                                         'The stored results are shown for the others')
+parser.add_option('--results-max-age', dest='results_max_age', type='int', default=86400,
+                  help='With --recheck, validate hosts again once their stored results are older than this many '
+                       'seconds. Default: 86400')
+parser.add_option('--workers', dest='workers', type='int', default=10, help='How many hosts to validate at the same '
+                                                                            'time. Default: 10')
+parser.add_option('--dns-workers', dest='dns_workers', type='int', default=50, help='How many DNS lookups to run at '
+                                                                                    'the same time. Default: 50')
+parser.add_option('--host-timeout', dest='host_timeout', type='int', default=900, help='Give up on a host if its '
+                                                                                      'checks take longer than this '
+                                                                                      'many seconds. Default: 900')
+parser.add_option('--command-timeout', dest='command_timeout', type='int', default=300, help='Give up on a remote '
+                                                                                            'command if it produces '
+                                                                                            'no output for this many '
+                                                                                            'seconds. Default: 300')
 (options, args) = parser.parse_args()
 
 if options.ansible_ssh_user:
@@ -61,14 +97,35 @@ original_docker_file_hashes_docker_1_12 = \
 
 forward_lookup_dict = {}
 reverse_lookup_dict = {}
+dns_latency_dict = {}
+# Results (or the socket error raised) of every lookup made in this run, keyed by (lookup function, name).
+# Hosts sharing an IP or listed more than once in the host file only hit the resolver once
+dns_cache = {}
+dns_cache_lock = threading.Lock()
 repo_dict = {}
 package_updates_available_dict = {}
 subscription_dict = {}
 ose_package_installed_dict = {}
 ose_package_not_installed_dict = {}
 etcd_partition_dict = {}
+# Hosts whose checks timed out or failed part way through
+host_validation_dict = {}
 ssh_connection = HandleSSHConnections()
 selinux_dict = {}
+# The name each summary dictionary is stored under in --results-file
+result_dictionaries = {"selinux": selinux_dict,
+                       "docker_files_modified": docker_files_have_been_modified_dict,
+                       "docker_file_sha_sums": remote_docker_file_sums_dict,
+                       "docker_service": docker_service_check_dict,
+                       "forward_lookup": forward_lookup_dict,
+                       "reverse_lookup": reverse_lookup_dict,
+                       "dns_latency": dns_latency_dict,
+                       "repos": repo_dict,
+                       "subscription": subscription_dict,
+                       "package_updates": package_updates_available_dict,
+                       "etcd_partition": etcd_partition_dict,
+                       "host_validation": host_validation_dict}
+results_file_lock = threading.Lock()
 if options.openshift_version:
     if "3.2" in options.openshift_version:
         openshift_server_repo = "rhel-7-server-ose-3.2-rpms"
@@ -85,6 +142,44 @@ if options.openshift_version:
 else:
     openshift_server_repo = "rhel-7-server-ose-3.3-rpms"
 ose_repos = ["rhel-7-server-rpms", "rhel-7-server-extras-rpms", openshift_server_repo]
+# The remote commands behind the checks, keyed by the name their output is stored under.
+# Without --probe they are run one at a time, with --probe they are all run by REMOTE_PROBE_SCRIPT in one round trip
+remote_check_commands = [("rpmdb_fingerprint", "stat -c '%n %Y %s' /var/lib/rpm/Packages /var/lib/rpm/rpmdb.sqlite "
+                                              "2>/dev/null"),
+                         ("etcd_partition", '/usr/bin/python -c \"import os; print os.path.ismount(\'/var/lib/etcd\')\"'),
+                         ("yum_installed", "yum list installed"),
+                         ("yum_updates", "yum list updates"),
+                         ("sestatus", "/usr/sbin/sestatus"),
+                         ("systemctl_docker", "systemctl status docker"),
+                         ("subscription_status", "subscription-manager status"),
+                         ("subscription_repos", "subscription-manager repos")]
+# The yum output is only refreshed once the rpm database (rpmdb_fingerprint) changes, see cached_package_output
+package_cache_keys = ["yum_installed", "yum_updates"]
+# Run with the remote host's python. It must work with python 2 and 3 and prints a single JSON document holding
+# the output lines of every command, plus the sha256sum output of each docker file under "sha256sum".
+# Commands in "skip" are not run when rpmdb_fingerprint matches "fingerprint", the caller already has their output
+REMOTE_PROBE_SCRIPT = """
+import json
+import os
+import subprocess
+
+def run(command):
+    devnull = open(os.devnull, 'w')
+    process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=devnull)
+    output = process.communicate()[0]
+    devnull.close()
+    return output.decode('utf-8', 'replace').splitlines(True)
+
+results = {'sha256sum': {}}
+cached = json.loads(%(cached)r)
+for docker_file in json.loads(%(docker_files)r):
+    results['sha256sum'][docker_file] = run('sha256sum ' + docker_file)
+for key, command in json.loads(%(commands)r):
+    if key in cached['skip'] and results.get('rpmdb_fingerprint') == cached['fingerprint']:
+        continue
+    results[key] = run(command)
+print(json.dumps(results))
+"""
 ose_required_packages_list = ["wget", "git", "net-tools", "bind-utils", "iptables-services", "bridge-utils",
                               "bash-completion", "atomic-openshift-utils", "docker"]
 
@@ -94,12 +189,13 @@ if not options.private_registry:
     default_docker_hashes.pop("/etc/sysconfig/docker")
 
 
-def is_selinux_enabled(host, ssh_obj, dict_to_modify):
+def is_selinux_enabled(host, ssh_obj, dict_to_modify, output=None):
     """
     is_selinux_enabled logs into the remote host and runs/parses 'sestatus'
-    adds results to a dictionary
+    adds results to a dictionary. Pass the output of 'sestatus' to skip running it
     """
-    output = HandleSSHConnections.run_remote_commands(ssh_obj, "/usr/sbin/sestatus")
+    if output is None:
+        output = HandleSSHConnections.run_remote_commands(ssh_obj, "/usr/sbin/sestatus")
     for line in output:
         if "SELinux status" in line:
             if "enabled" in line:
@@ -141,15 +237,18 @@ def process_host_file(ansible_host_file):
     return(hosts_list)
 
 
-def test_ssh_keys(host, user):
+def test_ssh_keys(host, user, ssh_obj=None):
     """
     test_ssh_keys simply attempts to open an ssh connection to the host
     returns True if the connection is accepted and False if Paramiko throws an exception
+    Uses the shared ssh_connection unless ssh_obj is given
     """
+    if ssh_obj is None:
+        ssh_obj = ssh_connection
     try:
-        print(textColors.HEADER + "Attempting to make a remote SSH connection..." + textColors.ENDC)
-        ssh_connection.open_ssh(host, user)
-        ssh_connection.close_ssh()
+        print(textColors.HEADER + "Attempting to make a remote SSH connection to %s..." % host + textColors.ENDC)
+        ssh_obj.open_ssh(host, user)
+        ssh_obj.close_ssh()
         ssh_connection_succeed = True
     except (paramiko.ssh_exception.AuthenticationException, socket.gaierror):
         ssh_connection_succeed = False
@@ -157,13 +256,33 @@ def test_ssh_keys(host, user):
     return(ssh_connection_succeed)
 
 
+def cached_dns_lookup(lookup_function, name):
+    """
+    cached_dns_lookup returns lookup_function(name), reusing the result of any earlier lookup of the same name.
+    Socket errors are cached as well and raised again for every caller
+    """
+    cache_key = (lookup_function.__name__, name)
+    with dns_cache_lock:
+        cached = dns_cache.get(cache_key)
+    if cached is None:
+        try:
+            cached = (lookup_function(name), None)
+        except socket.error as error:
+            cached = (None, error)
+        with dns_cache_lock:
+            dns_cache[cache_key] = cached
+    if cached[1] is not None:
+        raise cached[1]
+    return(cached[0])
+
+
 def check_forward_dns_lookup(host_name, dict_to_modify):
     """
     uses socket to do a forward lookup on host
     Does not return anything, inserts values into forward_lookup_dict
     """
     try:
-        host_ip = socket.gethostbyname(host_name)
+        host_ip = cached_dns_lookup(socket.gethostbyname, host_name)
         DictionaryHandling.add_to_dictionary(forward_lookup_dict, host_name, "IP Address", host_ip)
     except socket.gaierror:
         try:
@@ -184,7 +303,7 @@ def check_reverse_dns_lookup(lookup_dict, dict_to_modify):
         host_ip = lookup_dict[server_name]["IP Address"]
         if host_ip is not None:
             try:
-                hostname = socket.gethostbyaddr(host_ip)
+                hostname = cached_dns_lookup(socket.gethostbyaddr, host_ip)
                 DictionaryHandling.add_to_dictionary(dict_to_modify, server_name, "PTR Record", hostname[0])
             except socket.herror:
                 DictionaryHandling.add_to_dictionary(dict_to_modify, server_name, "PTR Record", None)
@@ -192,14 +311,18 @@ def check_reverse_dns_lookup(lookup_dict, dict_to_modify):
             DictionaryHandling.add_to_dictionary(dict_to_modify, server_name, "PTR Record", None)
 
 
-def check_docker_files(host, ssh_obj, files_modified_dict, dict_to_compare, remote_sha_sum_dict):
+def check_docker_files(host, ssh_obj, files_modified_dict, dict_to_compare, remote_sha_sum_dict, sha_sum_output=None):
     """
     check_docker_files assumes there is already a paramiko connection made to the server in question
     It attempts to take a sha256sum of the files in file_list
+    sha_sum_output can map each file to the output of 'sha256sum' to skip running it
     """
     for files in dict_to_compare.keys():
         try:
-            temp_list = HandleSSHConnections.run_remote_commands(ssh_obj, "sha256sum %s" % files)
+            if sha_sum_output is not None:
+                temp_list = sha_sum_output.get(files, [])
+            else:
+                temp_list = HandleSSHConnections.run_remote_commands(ssh_obj, "sha256sum %s" % files)
             shortened_file_name = files.split("/")[-1]
             for line in temp_list:
                 sha_sum = line.split()[0]
@@ -291,19 +414,17 @@ def which_repos_are_enabled(server_name, dict_to_modify, repo_info, these_should
                 DictionaryHandling.add_to_dictionary(dict_to_modify, server_name, repo_name, enabled)
 
 
-def installed_package_query(server_name, repo_dict_to_modify, package_list, ssh_obj):
+def installed_package_query(server_name, repo_dict_to_modify, package_list, ssh_obj, output=None):
     """
     installed_package_query uses the yum to determine if packages exist on the remote system
     Does not return anything, instead uses DictionaryHandling.add_to_dictionary to populate dictionaries
-    for processing later in the summation
+    for processing later in the summation. Pass the output of 'yum list installed' to skip running it
     """
     ose_required_packages_installed = []
     ose_required_packages_not_installed = []
-    temp_list = HandleSSHConnections.run_remote_commands(ssh_obj, "yum list installed")
-    installed_on_system = []
-    for package in temp_list:
-        package_name = package.split(".")[0]
-        installed_on_system.append(package_name)
+    if output is None:
+        output = HandleSSHConnections.run_remote_commands(ssh_obj, "yum list installed")
+    installed_on_system = set(package.split(".")[0] for package in output)
     for package in package_list:
         if package in installed_on_system:
             ose_required_packages_installed.append(package)
@@ -316,20 +437,23 @@ def installed_package_query(server_name, repo_dict_to_modify, package_list, ssh_
         DictionaryHandling.add_to_dictionary(repo_dict_to_modify, server_name, "All OSE Packages Installed", True)
 
 
-def update_required_query(server_name, package_update_dict, package_list, ssh_obj):
+def update_required_query(server_name, package_update_dict, package_list, ssh_obj, output=None):
     """
     update_required_query uses the yum to determine if packages have updates available
     Does not return anything, instead uses DictionaryHandling.add_to_dictionary to populate dictionaries
-    for processing later in the summation
+    for processing later in the summation. Pass the output of 'yum list updates' to skip running it
     """
-    packages_to_be_updated = HandleSSHConnections.run_remote_commands(ssh_obj, "yum list updates")
+    if output is None:
+        output = HandleSSHConnections.run_remote_commands(ssh_obj, "yum list updates")
+    packages_to_be_updated = output
+    required_packages = set(package_list)
     ose_package_needs_update = False
     system_up_to_date = True
     if len(packages_to_be_updated) > 2:
         system_up_to_date = False
         for package in packages_to_be_updated:
             package_name = package.split(".")[0]
-            if package_name in package_list:
+            if package_name in required_packages:
                 ose_package_needs_update = True
                 DictionaryHandling.add_to_dictionary(package_update_dict, server_name, "Update available for",
                                              package_name)
@@ -342,6 +466,345 @@ def parse_etcd(server_name, output, dict_to_modify):
         output = output[0].split("\n")[0]
         DictionaryHandling.add_to_dictionary(dict_to_modify, server_name, "ETCD partition", output)
 
+
+def load_package_cache(server):
+    """
+    load_package_cache reads the cached yum output of a host from the --package-cache directory.
+    Returns an empty dictionary if caching is disabled or nothing usable has been cached for the host
+    """
+    if options.package_cache is None:
+        return({})
+    try:
+        with open(os.path.join(options.package_cache, "%s.json" % server)) as cache_file:
+            return(json.load(cache_file))
+    except (IOError, ValueError):
+        return({})
+
+
+def save_package_cache(server, check_output, package_cache):
+    """
+    save_package_cache stores the yum output of a host alongside the rpm database fingerprint it was taken with.
+    Output which was itself reused from package_cache keeps its original timestamp
+    """
+    if options.package_cache is None or not check_output["rpmdb_fingerprint"]:
+        return
+    cached_output = {}
+    for output_key in package_cache_keys:
+        # Reused output is the very list loaded from package_cache, freshly run output never is
+        if output_key in package_cache.get("outputs", {}) and \
+                check_output[output_key] is package_cache["outputs"][output_key]["output"]:
+            cached_output[output_key] = package_cache["outputs"][output_key]
+        else:
+            cached_output[output_key] = {"cached_at": time.time(), "output": check_output[output_key]}
+    cache_path = os.path.join(options.package_cache, "%s.json" % server)
+    # Written to a temporary file first so that an interrupted run never leaves a truncated cache behind
+    with open(cache_path + ".tmp", "w") as cache_file:
+        json.dump({"rpmdb_fingerprint": check_output["rpmdb_fingerprint"], "outputs": cached_output}, cache_file)
+    os.rename(cache_path + ".tmp", cache_path)
+
+
+def cached_package_output(package_cache, fingerprint=None):
+    """
+    cached_package_output returns the cached yum output which is still valid, keyed like remote_check_commands.
+    The output of 'yum list installed' only depends on the rpm database, 'yum list updates' also depends on the
+    repositories so it is dropped after --package-cache-max-age seconds.
+    Without a fingerprint only the age is checked, the caller must compare the fingerprint itself
+    """
+    if not package_cache.get("rpmdb_fingerprint"):
+        return({})
+    if fingerprint is not None and fingerprint != package_cache["rpmdb_fingerprint"]:
+        return({})
+    still_valid = {}
+    for output_key, cached in package_cache["outputs"].items():
+        if output_key == "yum_updates" and time.time() - cached["cached_at"] > options.package_cache_max_age:
+            continue
+        still_valid[output_key] = cached["output"]
+    return(still_valid)
+
+
+def run_remote_checks(server, ssh_obj, package_cache):
+    """
+    run_remote_checks runs the sha256sum of each docker file and every command in remote_check_commands one at a time.
+    yum commands are skipped when package_cache still holds their output for the host's current rpm database.
+    Returns a dictionary in the same form as probe_host
+    """
+    check_output = {"sha256sum": {}}
+    cached_output = {}
+    for docker_file in default_docker_hashes.keys():
+        check_output["sha256sum"][docker_file] = HandleSSHConnections.run_remote_commands(ssh_obj, "sha256sum %s" %
+                                                                                          docker_file)
+    for output_key, command in remote_check_commands:
+        if output_key in cached_output:
+            print(textColors.HEADER + "Using the cached output of '%s' for %s..." % (command, server) + textColors.ENDC)
+            check_output[output_key] = cached_output[output_key]
+            continue
+        print(textColors.HEADER + "Running '%s' on %s..." % (command, server) + textColors.ENDC)
+        check_output[output_key] = HandleSSHConnections.run_remote_commands(ssh_obj, command)
+        if output_key == "rpmdb_fingerprint":
+            cached_output = cached_package_output(package_cache, check_output[output_key])
+    return(check_output)
+
+
+def probe_host(server, ssh_obj, package_cache):
+    """
+    probe_host sends REMOTE_PROBE_SCRIPT to the host's python so that every check is gathered in one round trip.
+    yum commands are skipped on the host when package_cache still holds their output for its current rpm database.
+    Returns a dictionary of each command's output lines, or None if the probe did not produce valid JSON
+    """
+    print(textColors.HEADER + "Running the validation probe on %s..." % server + textColors.ENDC)
+    cached_output = cached_package_output(package_cache)
+    probe_script = REMOTE_PROBE_SCRIPT % {"docker_files": json.dumps(list(default_docker_hashes.keys())),
+                                          "commands": json.dumps(remote_check_commands),
+                                          "cached": json.dumps({"fingerprint": package_cache.get("rpmdb_fingerprint"),
+                                                                "skip": list(cached_output.keys())})}
+    try:
+        output = HandleSSHConnections.run_remote_script(ssh_obj, probe_script)
+    except (socket.timeout, paramiko.ssh_exception.SSHException) as error:
+        # the probe only prints once every command is done, so slow yum or subscription-manager calls can time it out
+        print(textColors.WARNING + "The probe on %s failed (%s), running each check separately" %
+              (server, type(error).__name__) + textColors.ENDC)
+        return(None)
+    try:
+        check_output = json.loads(output)
+    except ValueError:
+        print(textColors.WARNING + "The probe on %s did not return JSON, running each check separately" % server +
+              textColors.ENDC)
+        return(None)
+    for output_key in cached_output:
+        if output_key not in check_output:
+            print(textColors.HEADER + "Using the cached output of '%s' for %s..." % (output_key, server) +
+                  textColors.ENDC)
+            check_output[output_key] = cached_output[output_key]
+    return(check_output)
+
+
+def record_remote_checks(server, check_output):
+    """
+    record_remote_checks parses the output gathered by run_remote_checks or probe_host into the summary dictionaries
+    """
+    check_docker_files(server, None, docker_files_have_been_modified_dict, default_docker_hashes,
+                       remote_docker_file_sums_dict, sha_sum_output=check_output["sha256sum"])
+    parse_etcd(server, check_output["etcd_partition"], etcd_partition_dict)
+    installed_package_query(server, repo_dict, ose_required_packages_list, None, output=check_output["yum_installed"])
+    update_required_query(server, package_updates_available_dict, ose_required_packages_list, None,
+                          output=check_output["yum_updates"])
+    is_selinux_enabled(server, None, selinux_dict, output=check_output["sestatus"])
+    is_docker_enabled(server, check_output["systemctl_docker"], docker_service_check_dict)
+    is_docker_running(server, check_output["systemctl_docker"], docker_service_check_dict)
+    is_host_subscribed(server, subscription_dict, check_output["subscription_status"])
+    which_repos_are_enabled(server, repo_dict, check_output["subscription_repos"], ose_repos)
+
+
+def collect_host_checks(server, user, host_ssh_connection, use_probe=False):
+    """
+    collect_host_checks runs every check against a single host over host_ssh_connection.
+    With use_probe the checks are gathered in a single round trip by probe_host.
+    Returns the output of the checks, or None if no ssh connection could be made. Nothing is added to the summary
+    dictionaries here so that a host which times out cannot add results after it has been reported
+    """
+    can_connect_to_server = test_ssh_keys(server, user, host_ssh_connection)
+    # if we can connect to remote host, go ahead and run the verification checks
+    if not can_connect_to_server:
+        return(None)
+    package_cache = load_package_cache(server)
+    host_ssh_connection.open_ssh(server, user)
+    try:
+        check_output = probe_host(server, host_ssh_connection, package_cache) if use_probe else None
+        if check_output is None:
+            check_output = run_remote_checks(server, host_ssh_connection, package_cache)
+    finally:
+        host_ssh_connection.close_ssh()
+    save_package_cache(server, check_output, package_cache)
+    return(check_output)
+
+
+def validate_host_with_timeout(server, user, command_timeout, host_timeout, use_probe=False):
+    """
+    validate_host_with_timeout runs collect_host_checks in its own thread and gives up on it after host_timeout
+    seconds by closing the host's ssh connection, which makes any remote command still running fail.
+    The results are only added to the summary dictionaries if the checks finished in time.
+    A host which times out or raises an error is recorded in host_validation_dict
+    """
+    errors = []
+    check_outputs = []
+    start_time = time.time()
+    host_ssh_connection = HandleSSHConnections(command_timeout=command_timeout)
+
+    def run_checks():
+        try:
+            check_outputs.append(collect_host_checks(server, user, host_ssh_connection, use_probe))
+        except Exception as error:
+            errors.append(error)
+
+    host_thread = threading.Thread(target=run_checks, name=server)
+    host_thread.daemon = True
+    host_thread.start()
+    host_thread.join(host_timeout)
+    timed_out = host_thread.is_alive()
+    if not timed_out and not errors and check_outputs[0] is not None:
+        try:
+            record_remote_checks(server, check_outputs[0])
+        except Exception as error:
+            errors.append(error)
+    if timed_out:
+        print(textColors.FAIL + "Validation of %s did not finish within %s seconds" % (server, host_timeout) + textColors.ENDC)
+        host_ssh_connection.close_ssh()
+        # give the thread a moment to fail on its closed connection so it does not add to the --workers running
+        host_thread.join(10)
+        DictionaryHandling.add_to_dictionary(host_validation_dict, server, "Validation completed", False)
+        DictionaryHandling.add_to_dictionary(host_validation_dict, server, "Reason", "Timed out after %s seconds" %
+                                             host_timeout)
+    elif errors:
+        print(textColors.FAIL + "Validation of %s failed: %s" % (server, errors[0]) + textColors.ENDC)
+        DictionaryHandling.add_to_dictionary(host_validation_dict, server, "Validation completed", False)
+        DictionaryHandling.add_to_dictionary(host_validation_dict, server, "Reason", "%s: %s" %
+                                             (type(errors[0]).__name__, errors[0]))
+    elif check_outputs[0] is None:
+        DictionaryHandling.add_to_dictionary(host_validation_dict, server, "Validation completed", False)
+        DictionaryHandling.add_to_dictionary(host_validation_dict, server, "Reason", "Could not make an SSH connection")
+    if options.results_file is not None:
+        store_host_results(options.results_file, server, time.time() - start_time)
+
+
+def check_passed(check, value):
+    """
+    check_passed decides whether a single stored check counts as a failure for --recheck.
+    These are the values format_output highlights in red, plus the "Warning" recorded when docker is not
+    running or not enabled
+    """
+    return(not (value is None or value is False or value == "Warning" or check == "Missing"))
+
+
+def store_host_results(results_file, server, duration):
+    """
+    store_host_results appends every check recorded for server to results_file as JSON lines.
+    All lines of one validation share the same recorded_at so the latest validation of a host can be told apart
+    """
+    recorded_at = time.time()
+    lines = []
+    for section, dictionary in sorted(result_dictionaries.items()):
+        for check, value in sorted(dictionary.get(server, {}).items()):
+            lines.append(json.dumps({"host": server, "section": section, "check": check, "value": value,
+                                     "passed": check_passed(check, value), "recorded_at": recorded_at,
+                                     "duration": round(duration, 3)}))
+    with results_file_lock:
+        with open(results_file, "a") as output_file:
+            output_file.write("".join(line + "\n" for line in lines))
+
+
+def load_stored_results(results_file):
+    """
+    load_stored_results reads results_file and returns the records of the latest validation of each host
+    as a dictionary of host: list of records. Lines which are not valid JSON are ignored
+    """
+    latest_results = {}
+    if not os.path.isfile(results_file):
+        return(latest_results)
+    for line in open(results_file):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        host_results = latest_results.setdefault(record["host"], [])
+        if host_results and record["recorded_at"] > host_results[0]["recorded_at"]:
+            del host_results[:]
+        if not host_results or record["recorded_at"] == host_results[0]["recorded_at"]:
+            host_results.append(record)
+    return(latest_results)
+
+
+def hosts_to_recheck(host_list, stored_results, max_age):
+    """
+    hosts_to_recheck returns the hosts in host_list which have no stored results, failed a check or whose results are
+    older than max_age seconds. Results from a section this version no longer knows about also cause a recheck.
+    The stored results of every other host are restored into the summary dictionaries
+    """
+    recheck_list = []
+    for server in host_list:
+        host_results = stored_results.get(server)
+        if not host_results or time.time() - host_results[0]["recorded_at"] > max_age or \
+                not all(record["passed"] and record["section"] in result_dictionaries for record in host_results):
+            recheck_list.append(server)
+            continue
+        print(textColors.OKGREEN + "Skipping %s, every check passed at %s" %
+              (server, time.ctime(host_results[0]["recorded_at"])) + textColors.ENDC)
+        for record in host_results:
+            DictionaryHandling.add_to_dictionary(result_dictionaries[record["section"]], server, record["check"],
+                                                 record["value"])
+    return(recheck_list)
+
+
+def run_in_parallel(function, host_list, workers):
+    """
+    run_in_parallel calls function once for every host in host_list using a pool of at most workers threads.
+    Returns once every call has returned
+    """
+    host_queue = Queue.Queue()
+    for server in host_list:
+        host_queue.put(server)
+
+    def worker():
+        while True:
+            try:
+                server = host_queue.get_nowait()
+            except Queue.Empty:
+                return
+            function(server)
+
+    worker_threads = [threading.Thread(target=worker) for _ in range(max(1, min(workers, len(host_list))))]
+    for worker_thread in worker_threads:
+        worker_thread.daemon = True
+        worker_thread.start()
+    for worker_thread in worker_threads:
+        # join with a timeout keeps the main thread responsive to Ctrl+C
+        while worker_thread.is_alive():
+            worker_thread.join(1)
+
+
+def resolve_host(server):
+    """
+    resolve_host does the forward and reverse lookups of a single host and records how long each one took
+    """
+    start_time = time.time()
+    forward_time = None
+    try:
+        check_forward_dns_lookup(server, forward_lookup_dict)
+        forward_time = time.time()
+        check_reverse_dns_lookup({server: forward_lookup_dict[server]}, reverse_lookup_dict)
+    except Exception as error:
+        # record the failure so the worker carries on with its other hosts
+        print(textColors.FAIL + "DNS lookup of %s failed: %s" % (server, error) + textColors.ENDC)
+        if forward_time is None:
+            DictionaryHandling.add_to_dictionary(forward_lookup_dict, server, "IP Address", None)
+        DictionaryHandling.add_to_dictionary(reverse_lookup_dict, server, "PTR Record", None)
+    reverse_time = time.time()
+    if forward_time is None:
+        forward_time = reverse_time
+    DictionaryHandling.add_to_dictionary(dns_latency_dict, server, "Forward lookup time (ms)",
+                                         round((forward_time - start_time) * 1000, 1))
+    DictionaryHandling.add_to_dictionary(dns_latency_dict, server, "Reverse lookup time (ms)",
+                                         round((reverse_time - forward_time) * 1000, 1))
+
+
+def resolve_hosts(host_list, workers):
+    """
+    resolve_hosts does the dns lookups of every host in host_list at the same time using a pool of at most
+    workers threads, so a slow or unreachable resolver costs one timeout rather than one per host
+    """
+    print(textColors.HEADER + "Attempting forward and reverse lookups of %s hosts..." % len(host_list) +
+          textColors.ENDC)
+    run_in_parallel(resolve_host, host_list, workers)
+
+
+def validate_hosts(host_list, user, workers, command_timeout, host_timeout, use_probe=False):
+    """
+    validate_hosts validates every host in host_list using a pool of at most workers threads.
+    Returns once every host has finished or timed out
+    """
+    run_in_parallel(lambda server: validate_host_with_timeout(server, user, command_timeout, host_timeout, use_probe),
+                    host_list, workers)
+
+
 if __name__ == "__main__":
     if options.ansible_host_file is None:
         print("No Ansible host file provided. This is required")
@@ -359,40 +822,21 @@ if __name__ == "__main__":
         parser.print_help()
         sys.exit()
 
+    if options.package_cache is not None and not os.path.isdir(options.package_cache):
+        os.makedirs(options.package_cache)
+
+    if options.recheck and options.results_file is None:
+        print("--recheck requires --results-file")
+        parser.print_help()
+        sys.exit()
+
     ansible_host_list = process_host_file(options.ansible_host_file)
-    for server in ansible_host_list:
-        print("\n")
-        can_connect_to_server = test_ssh_keys(server, ansible_ssh_user)
-        # if we can connect to remote host, go ahead and run the verification checks
-        if can_connect_to_server:
-            ssh_connection.open_ssh(server, ansible_ssh_user)
-            check_docker_files(server, ssh_connection, docker_files_have_been_modified_dict,
-                               default_docker_hashes, remote_docker_file_sums_dict)
-            print(textColors.HEADER + "Checking to see if /var/lib/etcd is a partition..." + textColors.ENDC)
-            etcd_partition_output = HandleSSHConnections.run_remote_commands(ssh_connection,
-                                                                      '/usr/bin/python -c \"import os; print os.path.ismount(\'/var/lib/etcd\')\"')
-            parse_etcd(server, etcd_partition_output, etcd_partition_dict)
-            print(textColors.HEADER + "Running 'yum list installed' on %s..." % server + textColors.ENDC)
-            installed_package_query(server, repo_dict, ose_required_packages_list, ssh_connection)
-            print(textColors.HEADER + "Running 'yum list updates' on %s..." % server + textColors.ENDC)
-            update_required_query(server, package_updates_available_dict, ose_required_packages_list, ssh_connection)
-            print(textColors.HEADER + "Running 'sestatus' on %s" % server + textColors.ENDC)
-            is_selinux_enabled(server, ssh_connection, selinux_dict)
-            print(textColors.HEADER + "Running 'systemctl status docker' on %s..." % server + textColors.ENDC)
-            systemctl_output = HandleSSHConnections.run_remote_commands(ssh_connection, "systemctl status docker")
-            is_docker_enabled(server, systemctl_output, docker_service_check_dict)
-            is_docker_running(server, systemctl_output, docker_service_check_dict)
-            print(textColors.HEADER + "Running 'subscription-manager status' on %s..." % server + textColors.ENDC)
-            sub_status = HandleSSHConnections.run_remote_commands(ssh_connection, "subscription-manager status")
-            is_host_subscribed(server, subscription_dict, sub_status)
-            print(textColors.HEADER + "Running 'subscription-manager repos' on %s..." % server + textColors.ENDC)
-            repo_information = HandleSSHConnections.run_remote_commands(ssh_connection, "subscription-manager repos")
-            which_repos_are_enabled(server, repo_dict, repo_information, ose_repos)
-            ssh_connection.close_ssh()
-        print(textColors.HEADER + "Attempting to forward lookup of %s..." % server + textColors.ENDC)
-        check_forward_dns_lookup(server, forward_lookup_dict)
-        print(textColors.HEADER + "Attempting to reverse lookup of %s..." % server + textColors.ENDC)
-        check_reverse_dns_lookup(forward_lookup_dict, reverse_lookup_dict)
+    if options.recheck:
+        ansible_host_list = hosts_to_recheck(ansible_host_list, load_stored_results(options.results_file),
+                                             options.results_max_age)
+    resolve_hosts(ansible_host_list, options.dns_workers)
+    validate_hosts(ansible_host_list, ansible_ssh_user, options.workers, options.command_timeout, options.host_timeout,
+                   options.probe)
 
     ##### Format output and display summary
     print(textColors.HEADER + textColors.BOLD + "\n\nSELinux Checks" + textColors.ENDC)
@@ -406,10 +850,14 @@ if __name__ == "__main__":
         DictionaryHandling.format_dictionary_output(docker_files_have_been_modified_dict, docker_service_check_dict)
 
     print(textColors.HEADER + textColors.BOLD + "\n\nDNS Lookups" + textColors.ENDC)
-    DictionaryHandling.format_dictionary_output(forward_lookup_dict, reverse_lookup_dict)
+    DictionaryHandling.format_dictionary_output(forward_lookup_dict, reverse_lookup_dict, dns_latency_dict)
 
     print(textColors.HEADER + textColors.BOLD + "\n\nPackages and repo information" + textColors.ENDC)
     DictionaryHandling.format_dictionary_output(repo_dict, subscription_dict, ose_package_not_installed_dict,
                                                 ose_package_installed_dict, package_updates_available_dict)
     print(textColors.HEADER + textColors.BOLD + "\n\nETCD has its own partition" + textColors.ENDC)
-    DictionaryHandling.format_dictionary_output(etcd_partition_dict)
\ No newline at end of file
+    DictionaryHandling.format_dictionary_output(etcd_partition_dict)
+
+    if host_validation_dict:
+        print(textColors.HEADER + textColors.BOLD + "\n\nHosts which could not be fully validated" + textColors.ENDC)
+        DictionaryHandling.format_dictionary_output(host_validation_dict)
\ No newline at end of file